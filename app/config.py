@@ -1,13 +1,38 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
+    # Logging: queued mode formats/writes on a background thread; sample rates are per
+    # event type, e.g. LOG_SAMPLE_RATES='{"http_request": 0.1, "ab_assignment": 0.05}'
+    LOG_LEVEL: str = "INFO"
+    LOG_STRUCTURED: bool = False
+    LOG_QUEUED: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: Dict[str, float] = Field(default_factory=dict)
+
     # Local file paths
     EMB_V1_PATH: str = "data/mock_embeddings_v1.pkl"
     EMB_V2_PATH: str = "data/mock_embeddings_v2.pkl"
     SAMPLE_APPS_PATH: str = "data/sample_apps.csv"
     HIST_PERF_PATH: str = "data/historical_performance.csv"
+    APP_METADATA_PATH: str = "data/app_metadata.pkl"
+    # Load both embedding arms, metadata and performance data in parallel at startup and
+    # run warm-up queries before /readyz reports ready (False: load lazily on first use)
+    EAGER_LOAD: bool = True
+    WARMUP_ROUNDS: int = 3
+    # gc.freeze() the loaded data out of future collections; optional gc.set_threshold values
+    # (e.g. GC_THRESHOLDS='[50000, 20, 100]'); per-generation pause histograms in /metrics
+    GC_FREEZE_AFTER_LOAD: bool = True
+    GC_THRESHOLDS: List[int] = Field(default_factory=list)
+    GC_MONITOR_ENABLED: bool = True
+    # Directory of dated daily partitions (e.g. 2025-10-19.csv) folded into the cache as they appear
+    HIST_PERF_PARTITIONS_DIR: str = "data/historical_performance"
+    PERF_REFRESH_INTERVAL_S: float = 300.0  # 0 disables background refresh
+    PERF_PARTITION_SETTLE_S: float = 10.0  # partitions modified more recently are left for the next refresh
+    HIST_PERF_DATE_COLUMN: str = "date"  # enables 7/30/90-day and decayed CTR aggregates
+    CTR_DECAY_HALF_LIFE_DAYS: float = 14.0
 
     # Google Drive URLs (optional - only needed if files don't exist locally)
     GDRIVE_EMB_V1_URL: str = Field(default="")
@@ -18,6 +43,69 @@ class Settings(BaseSettings):
     # API settings
     DEFAULT_TOP_K: int = 20
     AB_SPLIT_V1: float = 0.5  # 0..1
+    # Keep the pre-engine MD5 model-arm assignment so users in running experiments keep their arm.
+    # Turning this off reassigns roughly half of all sticky users; do it when starting a new experiment.
+    AB_LEGACY_MD5_BUCKETING: bool = True
+    # Optional JSON file of layered experiments {"layer": {"arm": weight}}, hot-reloaded on change
+    AB_EXPERIMENTS_PATH: str = ""
+    AB_RELOAD_INTERVAL_S: float = 30.0
+
+    # A/B exposure/outcome event log (rotated NDJSON files written off the request path)
+    AB_EVENTS_ENABLED: bool = False
+    AB_EVENTS_DIR: str = "data/ab_events"
+    AB_EVENTS_QUEUE_SIZE: int = 10000
+    AB_EVENTS_BATCH_SIZE: int = 500
+    AB_EVENTS_MAX_FILE_MB: int = 64
+
+    # Cross-worker metrics: each worker publishes its counters to an mmap file in this
+    # directory (use tmpfs, e.g. /dev/shm/mobupps-metrics); empty disables fleet metrics
+    METRICS_SHM_DIR: str = ""
+    METRICS_SHM_FLUSH_INTERVAL_S: float = 1.0
+
+    # Encode find-similar/predict responses directly from result columns (orjson if installed),
+    # skipping response_model validation; the OpenAPI schema is unchanged
+    FAST_JSON_RESPONSES: bool = False
+
+    # find-similar deadlines: time kept back from the client's budget for the metadata
+    # join and serialization after scoring stops
+    DEADLINE_RESERVE_MS: float = 2.0
+
+    # Adaptive admission control for find-similar/predict: AIMD concurrency limit driven by
+    # windowed p90 latency, bounded wait queue, 503 + Retry-After when shedding
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 16
+    ADMISSION_MIN_LIMIT: int = 2
+    ADMISSION_MAX_LIMIT: int = 64
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 50.0
+    ADMISSION_TARGET_LATENCY_MS: float = 150.0
+    ADMISSION_RETRY_AFTER_S: float = 1.0
+
+    # Bulkheads: dedicated thread pools for find-similar (one per arm) and predict, each with
+    # a bounded wait queue; BLAS_THREADS caps numpy's BLAS/OpenMP threads (0 = library default)
+    BULKHEADS_ENABLED: bool = True
+    BULKHEAD_FIND_SIMILAR_WORKERS: int = 4
+    BULKHEAD_PREDICT_WORKERS: int = 4
+    BULKHEAD_MAX_QUEUE: int = 64
+    BLAS_THREADS: int = 1
+
+    # Preload-and-fork server (python -m app.server): worker count, heartbeat-based
+    # supervision and graceful stop/restart timeouts
+    SERVER_WORKERS: int = 2
+    SERVER_WORKER_TIMEOUT_S: float = 30.0
+    SERVER_HEARTBEAT_INTERVAL_S: float = 5.0
+    SERVER_GRACEFUL_TIMEOUT_S: float = 30.0
+
+    # Add a Server-Timing header with per-stage durations to API responses
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Admin/diagnostics routes under /admin (profiler etc.); served only when enabled
+    # and ADMIN_TOKEN is set, which must then be sent in the X-Admin-Token header
+    ADMIN_ENABLED: bool = False
+    ADMIN_TOKEN: str = ""
+    PROFILER_MAX_DURATION_S: float = 60.0
+    SLOW_REQUESTS_PER_ENDPOINT: int = 20  # slowest requests kept per endpoint
+    SLOW_REQUESTS_WINDOW_S: float = 900.0
 
     # CORS settings (can be overridden in .env as CORS_ORIGINS="http://localhost:3000,https://myapp.lovable.app")
     CORS_ORIGINS: str = Field(
@@ -26,6 +114,8 @@ class Settings(BaseSettings):
     CORS_ALLOW_CREDENTIALS: bool = True
     CORS_ALLOW_METHODS: list[str] = Field(default=["*"])
     CORS_ALLOW_HEADERS: list[str] = Field(default=["*"])
+    # Response headers browser clients may read (Retry-After on shed 503s)
+    CORS_EXPOSE_HEADERS: list[str] = Field(default=["Retry-After", "X-Correlation-ID"])
 
     @property
     def cors_origins_list(self) -> list[str]:
@@ -0,0 +1,173 @@
+# Module: ab_events.py
+"""
+Append-only A/B exposure and outcome event log.
+
+Request threads only enqueue a small dict into a bounded queue (dropping on
+overflow, never blocking); a background writer thread batches events into
+rotated NDJSON files for offline analysis.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ABEventLog:
+    """Bounded, buffered writer of A/B events to rotated NDJSON files"""
+
+    def __init__(
+        self,
+        directory: str,
+        queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_s: float = 1.0,
+        max_file_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = Path(directory)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_file_bytes = max_file_bytes
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._file_bytes = 0
+        self.dropped = 0
+        self.written = 0
+
+    def start(self) -> None:
+        """Start the background writer thread"""
+        if self._thread is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="ab-event-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush pending events and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)  # sentinel; blocking is fine at shutdown
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # The writer closes the file itself once it finishes the current batch
+            logger.warning(f"A/B event writer still running after {timeout}s")
+            return
+        self._thread = None
+
+    def record(self, event_type: str, **fields: Any) -> bool:
+        """
+        Enqueue an event without blocking.
+
+        Returns:
+            False if the queue was full and the event was dropped
+        """
+        fields["type"] = event_type
+        fields["ts"] = time.time()
+        try:
+            self._queue.put_nowait(fields)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self) -> None:
+        try:
+            self._drain()
+        finally:
+            self._close_file()
+
+    def _drain(self) -> None:
+        while True:
+            batch: List[Dict[str, Any]] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    event = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if event is None:
+                    stop = True
+                    break
+                batch.append(event)
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.error(f"Failed to write {len(batch)} A/B events: {str(e)}")
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch).encode()
+        if self._file is None or self._file_bytes + len(data) > self.max_file_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(batch)
+
+    def _rotate(self) -> None:
+        self._close_file()
+        name = f"ab-events-{os.getpid()}-{time.strftime('%Y%m%dT%H%M%S')}-{time.monotonic_ns()}.ndjson"
+        self._file = open(self.directory / name, "ab")
+        self._file_bytes = 0
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Global instance, configured at startup when AB_EVENTS_ENABLED is set
+_ab_event_log: Optional[ABEventLog] = None
+
+
+def start_ab_event_log(directory: str, **kwargs: Any) -> ABEventLog:
+    """Create and start the global A/B event log"""
+    global _ab_event_log
+    _ab_event_log = ABEventLog(directory, **kwargs)
+    _ab_event_log.start()
+    return _ab_event_log
+
+
+def stop_ab_event_log() -> None:
+    """Flush and stop the global A/B event log"""
+    global _ab_event_log
+    if _ab_event_log is not None:
+        _ab_event_log.stop()
+        _ab_event_log = None
+
+
+def record_ab_exposure(arm: str, app_id: Optional[str], partner_id: Optional[str],
+                       latency_ms: float, neighbor_count: int) -> None:
+    """Convenience function to record a find-similar exposure (no-op when disabled)"""
+    if _ab_event_log is not None:
+        _ab_event_log.record(
+            "exposure", arm=arm, app_id=app_id, partner_id=partner_id,
+            latency_ms=latency_ms, neighbor_count=neighbor_count,
+        )
+
+
+def record_ab_outcome(arm: str, app_id: Optional[str], partner_id: Optional[str],
+                      latency_ms: float, neighbor_count: int, score: float) -> None:
+    """Convenience function to record a prediction outcome (no-op when disabled)"""
+    if _ab_event_log is not None:
+        _ab_event_log.record(
+            "outcome", arm=arm, app_id=app_id, partner_id=partner_id,
+            latency_ms=latency_ms, neighbor_count=neighbor_count, score=score,
+        )
@@ -4,12 +4,82 @@ Metrics and instrumentation for MobUpps API
 Provides request counters, latency tracking, and A/B test metrics
 """
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Optional
 from collections import defaultdict
 from threading import Lock
+import math
+import threading
 import time
 
 
+# Per-arm streaming metrics compared between A/B arms
+AB_ARM_METRICS = ("latency_ms", "score", "similarity")
+
+# Sliding windows: a ring of 10s buckets covering the last 15 minutes
+WINDOW_BUCKET_S = 10
+WINDOW_SLOTS = 90
+WINDOWS = {"1m": 6, "5m": 30, "15m": 90}  # window name -> number of buckets
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory log-bucketed histogram (DDSketch-style).
+
+    Bucket i covers [MIN_MS * GAMMA**i, MIN_MS * GAMMA**(i+1)), so any quantile
+    is reported within RELATIVE_ACCURACY of the true sample value. Adding a
+    sample is O(1); quantiles are only computed when read. Histograms with the
+    same layout merge by adding counts.
+    """
+    RELATIVE_ACCURACY = 0.01
+    MIN_MS = 0.001
+    MAX_MS = 1_000_000.0
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    LOG_GAMMA = math.log(GAMMA)
+    NUM_BUCKETS = int(math.ceil(math.log(MAX_MS / MIN_MS) / LOG_GAMMA)) + 1
+
+    __slots__ = ("counts", "count")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * self.NUM_BUCKETS
+        self.count = 0
+
+    @classmethod
+    def bucket_index(cls, value_ms: float) -> int:
+        if value_ms <= cls.MIN_MS:
+            return 0
+        return min(int(math.log(value_ms / cls.MIN_MS) / cls.LOG_GAMMA), cls.NUM_BUCKETS - 1)
+
+    @classmethod
+    def bucket_value(cls, index: int) -> float:
+        """Representative value of a bucket (relative error <= RELATIVE_ACCURACY)"""
+        return cls.MIN_MS * cls.GAMMA ** index * 2 * cls.GAMMA / (cls.GAMMA + 1)
+
+    @classmethod
+    def bucket_upper_bound(cls, index: int) -> float:
+        return cls.MIN_MS * cls.GAMMA ** (index + 1)
+
+    def add(self, value_ms: float) -> None:
+        self.counts[self.bucket_index(value_ms)] += 1
+        self.count += 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's counts into this one"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile q (0..1); 0.0 when empty"""
+        if self.count == 0:
+            return 0.0
+        rank = int(self.count * q)
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative > rank:
+                return self.bucket_value(index)
+        return self.bucket_value(self.NUM_BUCKETS - 1)
+
+
 @dataclass
 class LatencyStats:
     """Statistics for tracking latencies"""
@@ -17,29 +87,41 @@ class LatencyStats:
     total_ms: float = 0.0
     min_ms: float = float('inf')
     max_ms: float = 0.0
-    p50_ms: float = 0.0
-    p95_ms: float = 0.0
-    p99_ms: float = 0.0
-    samples: List[float] = field(default_factory=list)
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
 
     def add_sample(self, latency_ms: float) -> None:
-        """Add a latency sample"""
+        """Add a latency sample (O(1))"""
         self.count += 1
         self.total_ms += latency_ms
         self.min_ms = min(self.min_ms, latency_ms)
         self.max_ms = max(self.max_ms, latency_ms)
-        self.samples.append(latency_ms)
+        self.histogram.add(latency_ms)
+
+    def merge(self, other: "LatencyStats") -> None:
+        """Fold another LatencyStats into this one"""
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.min_ms = min(self.min_ms, other.min_ms)
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.histogram.merge(other.histogram)
+
+    def percentile(self, q: float) -> float:
+        """Percentile from the histogram, clamped to the observed min/max"""
+        if self.count == 0:
+            return 0.0
+        return min(max(self.histogram.quantile(q), self.min_ms), self.max_ms)
 
-        # Keep only last 1000 samples for percentile calculation
-        if len(self.samples) > 1000:
-            self.samples.pop(0)
+    @property
+    def p50_ms(self) -> float:
+        return self.percentile(0.50)
 
-        # Update percentiles
-        if self.samples:
-            sorted_samples = sorted(self.samples)
-            self.p50_ms = sorted_samples[int(len(sorted_samples) * 0.50)]
-            self.p95_ms = sorted_samples[int(len(sorted_samples) * 0.95)]
-            self.p99_ms = sorted_samples[int(len(sorted_samples) * 0.99)]
+    @property
+    def p95_ms(self) -> float:
+        return self.percentile(0.95)
+
+    @property
+    def p99_ms(self) -> float:
+        return self.percentile(0.99)
 
     @property
     def avg_ms(self) -> float:
@@ -47,14 +129,187 @@ class LatencyStats:
         return self.total_ms / self.count if self.count > 0 else 0.0
 
 
-class MetricsCollector:
+class SlidingWindow:
     """
-    In-memory metrics collector for API performance tracking
-    Thread-safe for concurrent requests
+    Time-bucketed request/error counts and sparse latency histograms.
+
+    Each 10s bucket is tagged with its epoch; a bucket from an older lap of the
+    ring is cleared on first write, so rotation is O(1) and needs no timer.
     """
+    __slots__ = ("epochs", "requests", "errors", "histograms")
 
     def __init__(self):
-        self._lock = Lock()
+        self.epochs: List[int] = [-1] * WINDOW_SLOTS
+        self.requests: List[int] = [0] * WINDOW_SLOTS
+        self.errors: List[int] = [0] * WINDOW_SLOTS
+        self.histograms: List[Dict[int, int]] = [{} for _ in range(WINDOW_SLOTS)]
+
+    def _slot(self, now: float) -> int:
+        epoch = int(now // WINDOW_BUCKET_S)
+        slot = epoch % WINDOW_SLOTS
+        if self.epochs[slot] != epoch:
+            self.histograms[slot] = {}
+            self.requests[slot] = 0
+            self.errors[slot] = 0
+            self.epochs[slot] = epoch
+        return slot
+
+    def add(self, latency_ms: Optional[float] = None, error: bool = False, now: Optional[float] = None) -> None:
+        """Count a request (optionally with its latency) in the current bucket"""
+        slot = self._slot(time.time() if now is None else now)
+        self.requests[slot] += 1
+        if error:
+            self.errors[slot] += 1
+        if latency_ms is not None:
+            histogram = self.histograms[slot]
+            index = LatencyHistogram.bucket_index(latency_ms)
+            histogram[index] = histogram.get(index, 0) + 1
+
+    def merge(self, other: "SlidingWindow") -> None:
+        """Fold another window's buckets into this one (the newer epoch wins a slot)"""
+        for slot in range(WINDOW_SLOTS):
+            epoch = other.epochs[slot]
+            if epoch < 0 or epoch < self.epochs[slot]:
+                continue
+            if epoch > self.epochs[slot]:
+                self.epochs[slot] = epoch
+                self.requests[slot] = 0
+                self.errors[slot] = 0
+                self.histograms[slot] = {}
+            self.requests[slot] += other.requests[slot]
+            self.errors[slot] += other.errors[slot]
+            histogram = self.histograms[slot]
+            for index, count in other.histograms[slot].copy().items():
+                histogram[index] = histogram.get(index, 0) + count
+
+    def collect(self, buckets: int, now: float, into: "WindowTotals") -> None:
+        """Add the last `buckets` buckets into a WindowTotals accumulator"""
+        current = int(now // WINDOW_BUCKET_S)
+        oldest = current - buckets + 1
+        for slot in range(WINDOW_SLOTS):
+            if oldest <= self.epochs[slot] <= current:
+                into.requests += self.requests[slot]
+                into.errors += self.errors[slot]
+                for index, count in self.histograms[slot].copy().items():
+                    into.histogram[index] = into.histogram.get(index, 0) + count
+
+
+@dataclass
+class WindowTotals:
+    """Merged counts for one window across shards"""
+    requests: int = 0
+    errors: int = 0
+    histogram: Dict[int, int] = field(default_factory=dict)
+
+    def quantile(self, q: float) -> float:
+        total = sum(self.histogram.values())
+        if total == 0:
+            return 0.0
+        rank = int(total * q)
+        cumulative = 0
+        for index in sorted(self.histogram):
+            cumulative += self.histogram[index]
+            if cumulative > rank:
+                return LatencyHistogram.bucket_value(index)
+        return 0.0
+
+    def summary(self, seconds: float) -> Dict:
+        return {
+            "requests": self.requests,
+            "rate_rps": round(self.requests / seconds, 3) if seconds > 0 else 0.0,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "p50_ms": round(self.quantile(0.50), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+        }
+
+
+@dataclass
+class StreamingMoments:
+    """Running count/mean/variance updated with Welford's algorithm (O(1) per sample)"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, value: float) -> None:
+        """Add a sample"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Unbiased sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def confidence_interval(self, z: float = 1.96) -> tuple:
+        """Normal-approximation confidence interval for the mean (95% by default)"""
+        if self.count < 2:
+            return (self.mean, self.mean)
+        half_width = z * math.sqrt(self.variance / self.count)
+        return (self.mean - half_width, self.mean + half_width)
+
+    def merge(self, other: "StreamingMoments") -> None:
+        """Combine with another set of moments (Chan et al. parallel update)"""
+        count, mean, m2 = other.count, other.mean, other.m2  # read once; other may be live
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+
+def sequential_test(a: StreamingMoments, b: StreamingMoments, alpha: float = 0.05) -> Dict:
+    """
+    Mixture sequential probability ratio test (mSPRT) for a difference in means.
+
+    Uses a normal mixing distribution with variance equal to the pooled sample
+    variance. The resulting p-value stays valid no matter how often it is
+    checked, so /metrics can be polled continuously during an experiment.
+    """
+    if a.count < 2 or b.count < 2:
+        return {"difference": None, "p_value": 1.0, "significant": False}
+
+    difference = b.mean - a.mean
+    v = a.variance / a.count + b.variance / b.count
+    tau_sq = (a.variance + b.variance) / 2
+    if v <= 0 or tau_sq <= 0:
+        return {"difference": difference, "p_value": 1.0, "significant": False}
+
+    log_lr = 0.5 * math.log(v / (v + tau_sq)) + (tau_sq * difference ** 2) / (2 * v * (v + tau_sq))
+    p_value = min(1.0, math.exp(-log_lr)) if log_lr > 0 else 1.0
+    return {
+        "difference": round(difference, 6),
+        "p_value": round(p_value, 6),
+        "significant": p_value < alpha,
+    }
+
+
+def _latency_summary(stats: LatencyStats) -> Dict:
+    return {
+        "count": stats.count,
+        "avg_ms": round(stats.avg_ms, 2),
+        "min_ms": round(stats.min_ms, 2) if stats.min_ms != float('inf') else 0,
+        "max_ms": round(stats.max_ms, 2),
+        "p50_ms": round(stats.p50_ms, 2),
+        "p95_ms": round(stats.p95_ms, 2),
+        "p99_ms": round(stats.p99_ms, 2),
+    }
+
+
+class _MetricsShard:
+    """
+    Counters written by a single thread.
+
+    Each thread records into its own shard without locking; shards are only
+    merged when a summary is requested.
+    """
+
+    def __init__(self, owner: Optional[threading.Thread] = None):
+        self.owner = owner  # writing thread; None for merged/retired shards
 
         # Request counters
         self.request_count = 0
@@ -63,89 +318,289 @@ class MetricsCollector:
 
         # Latency tracking
         self.latencies_by_endpoint: Dict[str, LatencyStats] = defaultdict(LatencyStats)
+        self.stage_latencies: Dict[str, Dict[str, LatencyStats]] = defaultdict(lambda: defaultdict(LatencyStats))
 
         # A/B test metrics
         self.ab_assignments: Dict[str, int] = defaultdict(int)  # arm -> count
         self.ab_assignments_by_endpoint: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.ab_arm_stats: Dict[str, Dict[str, StreamingMoments]] = defaultdict(lambda: defaultdict(StreamingMoments))
 
         # Error counters
         self.error_count = 0
         self.error_count_by_type: Dict[str, int] = defaultdict(int)
 
+        # Sliding windows (1m/5m/15m) per endpoint and per arm
+        self.windows_by_endpoint: Dict[str, SlidingWindow] = defaultdict(SlidingWindow)
+        self.windows_by_arm: Dict[str, SlidingWindow] = defaultdict(SlidingWindow)
+
+    def merge(self, other: "_MetricsShard") -> None:
+        """
+        Fold another (possibly live) shard into this one.
+
+        Containers are copied before iterating, which is atomic under the GIL,
+        so a concurrent writer can never break the merge; at worst the result
+        misses samples recorded while it runs.
+        """
+        self.request_count += other.request_count
+        self.error_count += other.error_count
+        for key, value in other.request_count_by_endpoint.copy().items():
+            self.request_count_by_endpoint[key] += value
+        for key, value in other.request_count_by_status.copy().items():
+            self.request_count_by_status[key] += value
+        for key, value in other.error_count_by_type.copy().items():
+            self.error_count_by_type[key] += value
+        for key, stats in other.latencies_by_endpoint.copy().items():
+            self.latencies_by_endpoint[key].merge(stats)
+        for endpoint, stages in other.stage_latencies.copy().items():
+            for stage, stats in stages.copy().items():
+                self.stage_latencies[endpoint][stage].merge(stats)
+        for key, value in other.ab_assignments.copy().items():
+            self.ab_assignments[key] += value
+        for endpoint, arms in other.ab_assignments_by_endpoint.copy().items():
+            for arm, value in arms.copy().items():
+                self.ab_assignments_by_endpoint[endpoint][arm] += value
+        for arm, stats in other.ab_arm_stats.copy().items():
+            for metric, moments in stats.copy().items():
+                self.ab_arm_stats[arm][metric].merge(moments)
+
+    def merge_windows(self, other: "_MetricsShard") -> None:
+        """Fold another shard's sliding windows into this one"""
+        for key, window in other.windows_by_endpoint.copy().items():
+            self.windows_by_endpoint[key].merge(window)
+        for key, window in other.windows_by_arm.copy().items():
+            self.windows_by_arm[key].merge(window)
+
+
+class MetricsCollector:
+    """
+    In-memory metrics collector for API performance tracking
+
+    Thread-safe without a hot-path lock: every thread writes to its own shard
+    and get_summary() merges a snapshot of the shard list, so scraping never
+    blocks request threads. Shards of threads that have exited (AnyIO and
+    bulkhead workers come and go) are folded into a single retired shard when
+    metrics are read, so the shard list stays bounded by the live threads.
+    """
+
+    def __init__(self):
+        self._registry_lock = Lock()  # only taken when a thread creates its shard
+        self._local = threading.local()
+        self._shards: List[_MetricsShard] = []
+
+        # GC pauses per generation; collections never overlap, so these need no lock
+        # (and must not take one: a collection can start while a lock is held)
+        self.gc_pauses: Dict[int, LatencyStats] = {gen: LatencyStats() for gen in range(3)}
+        self.gc_collected: Dict[int, int] = {gen: 0 for gen in range(3)}
+
         # Start time
         self.start_time = time.time()
 
+    def _shard(self) -> _MetricsShard:
+        """The calling thread's shard, registered on first use"""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _MetricsShard(threading.current_thread())
+            with self._registry_lock:
+                # Copy-on-write so readers can iterate the list without locking
+                self._shards = self._shards + [shard]
+            self._local.shard = shard
+        return shard
+
     def record_request(self, endpoint: str, status_code: int, latency_ms: float) -> None:
         """Record an HTTP request with its metrics"""
-        with self._lock:
-            self.request_count += 1
-            self.request_count_by_endpoint[endpoint] += 1
-            self.request_count_by_status[status_code] += 1
-            self.latencies_by_endpoint[endpoint].add_sample(latency_ms)
+        shard = self._shard()
+        shard.request_count += 1
+        shard.request_count_by_endpoint[endpoint] += 1
+        shard.request_count_by_status[status_code] += 1
+        shard.latencies_by_endpoint[endpoint].add_sample(latency_ms)
+
+        # Track errors (4xx and 5xx)
+        if status_code >= 400:
+            shard.error_count += 1
+
+        shard.windows_by_endpoint[endpoint].add(latency_ms, error=status_code >= 400)
+
+    def record_latency(self, endpoint: str, latency_ms: float) -> None:
+        """Record a latency sample only (without full request details)"""
+        self._shard().latencies_by_endpoint[endpoint].add_sample(latency_ms)
 
-            # Track errors (4xx and 5xx)
-            if status_code >= 400:
-                self.error_count += 1
+    def record_stage_latencies(self, endpoint: str, stages: List[tuple]) -> None:
+        """Record per-stage durations [(stage, ms), ...] of one request"""
+        by_stage = self._shard().stage_latencies[endpoint]
+        for stage, duration_ms in stages:
+            by_stage[stage].add_sample(duration_ms)
 
     def record_ab_assignment(self, endpoint: str, arm: str) -> None:
         """Record an A/B test arm assignment"""
-        with self._lock:
-            self.ab_assignments[arm] += 1
-            self.ab_assignments_by_endpoint[endpoint][arm] += 1
+        shard = self._shard()
+        shard.ab_assignments[arm] += 1
+        shard.ab_assignments_by_endpoint[endpoint][arm] += 1
+
+    def record_ab_metrics(self, arm: str, latency_ms: Optional[float] = None,
+                          score: Optional[float] = None, similarity: Optional[float] = None,
+                          error: bool = False) -> None:
+        """Update per-arm streaming moments for latency, prediction score and neighbor similarity"""
+        shard = self._shard()
+        if latency_ms is not None or error:
+            shard.windows_by_arm[arm].add(latency_ms, error=error)
+        stats = shard.ab_arm_stats[arm]
+        if latency_ms is not None:
+            stats["latency_ms"].add(latency_ms)
+        if score is not None:
+            stats["score"].add(score)
+        if similarity is not None:
+            stats["similarity"].add(similarity)
 
     def record_error(self, error_type: str) -> None:
         """Record an error occurrence"""
-        with self._lock:
-            self.error_count += 1
-            self.error_count_by_type[error_type] += 1
+        shard = self._shard()
+        shard.error_count += 1
+        shard.error_count_by_type[error_type] += 1
+
+    def record_gc_pause(self, generation: int, duration_ms: float, collected: int = 0) -> None:
+        """Record one garbage collection pause (called from a gc.callbacks hook)"""
+        self.gc_pauses[generation].add_sample(duration_ms)
+        self.gc_collected[generation] += collected
+
+    def _retire_dead_shards(self) -> None:
+        """Fold shards of exited threads into the retired shard (the only shard without an owner)"""
+        if all(shard.owner is None or shard.owner.is_alive() for shard in self._shards):
+            return
+        with self._registry_lock:
+            retired = _MetricsShard()
+            live = []
+            for shard in self._shards:
+                if shard.owner is not None and shard.owner.is_alive():
+                    live.append(shard)
+                else:
+                    retired.merge(shard)
+                    retired.merge_windows(shard)
+            # One assignment: readers see either the old list or the folded one, never both
+            self._shards = [retired] + live
+
+    def snapshot(self) -> _MetricsShard:
+        """Merge all shards into a fresh, private shard"""
+        self._retire_dead_shards()
+        merged = _MetricsShard()
+        for shard in self._shards:
+            merged.merge(shard)
+        return merged
+
+    def _window_totals(self, kind: str, key: str, buckets: int, now: float) -> WindowTotals:
+        totals = WindowTotals()
+        for shard in self._shards:
+            window = getattr(shard, kind).get(key)
+            if window is not None:
+                window.collect(buckets, now, totals)
+        return totals
+
+    def _window_seconds(self, buckets: int, now: float) -> float:
+        """Covered seconds: full older buckets plus the elapsed part of the current one"""
+        seconds = (buckets - 1) * WINDOW_BUCKET_S + (now % WINDOW_BUCKET_S)
+        return min(seconds, now - self.start_time)
+
+    def window_stats(self, endpoint: Optional[str] = None, arm: Optional[str] = None,
+                     window: str = "1m") -> Dict:
+        """
+        Request rate, error rate and latency percentiles over a sliding window
+        for one endpoint or one arm (e.g. for autoscaling/load-shedding decisions).
+        """
+        self._retire_dead_shards()
+        kind, key = ("windows_by_arm", arm) if arm is not None else ("windows_by_endpoint", endpoint)
+        now = time.time()
+        buckets = WINDOWS[window]
+        return self._window_totals(kind, key, buckets, now).summary(self._window_seconds(buckets, now))
+
+    def _windows_summary(self, kind: str) -> Dict:
+        now = time.time()
+        keys = set()
+        for shard in self._shards:
+            keys.update(getattr(shard, kind).copy())
+        return {
+            key: {
+                name: self._window_totals(kind, key, buckets, now).summary(self._window_seconds(buckets, now))
+                for name, buckets in WINDOWS.items()
+            }
+            for key in sorted(keys)
+        }
 
     def get_summary(self) -> Dict:
         """Get a summary of all collected metrics"""
-        with self._lock:
-            uptime_seconds = time.time() - self.start_time
-
-            # Calculate latency stats per endpoint
-            latencies_summary = {}
-            for endpoint, stats in self.latencies_by_endpoint.items():
-                latencies_summary[endpoint] = {
-                    "count": stats.count,
-                    "avg_ms": round(stats.avg_ms, 2),
-                    "min_ms": round(stats.min_ms, 2) if stats.min_ms != float('inf') else 0,
-                    "max_ms": round(stats.max_ms, 2),
-                    "p50_ms": round(stats.p50_ms, 2),
-                    "p95_ms": round(stats.p95_ms, 2),
-                    "p99_ms": round(stats.p99_ms, 2),
-                }
-
-            # A/B test summary
-            ab_summary = {
-                "total_assignments": sum(self.ab_assignments.values()),
-                "by_arm": dict(self.ab_assignments),
-                "by_endpoint": {
-                    endpoint: dict(arms)
-                    for endpoint, arms in self.ab_assignments_by_endpoint.items()
+        uptime_seconds = time.time() - self.start_time
+        snap = self.snapshot()
+
+        # Calculate latency stats per endpoint
+        latencies_summary = {
+            endpoint: _latency_summary(stats)
+            for endpoint, stats in snap.latencies_by_endpoint.items()
+        }
+        stages_summary = {
+            endpoint: {stage: _latency_summary(stats) for stage, stats in stages.items()}
+            for endpoint, stages in snap.stage_latencies.items()
+        }
+
+        # A/B test summary
+        ab_summary = {
+            "total_assignments": sum(snap.ab_assignments.values()),
+            "by_arm": dict(snap.ab_assignments),
+            "by_endpoint": {
+                endpoint: dict(arms)
+                for endpoint, arms in snap.ab_assignments_by_endpoint.items()
+            },
+            "arm_stats": {
+                arm: {
+                    metric: {
+                        "count": m.count,
+                        "mean": round(m.mean, 4),
+                        "stddev": round(math.sqrt(m.variance), 4),
+                        "ci95": [round(bound, 4) for bound in m.confidence_interval()],
+                    }
+                    for metric, m in stats.items()
                 }
-            }
-
-            return {
-                "uptime_seconds": round(uptime_seconds, 2),
-                "requests": {
-                    "total": self.request_count,
-                    "by_endpoint": dict(self.request_count_by_endpoint),
-                    "by_status": dict(self.request_count_by_status),
-                },
-                "latencies": latencies_summary,
-                "ab_tests": ab_summary,
-                "errors": {
-                    "total": self.error_count,
-                    "by_type": dict(self.error_count_by_type),
-                },
-            }
+                for arm, stats in snap.ab_arm_stats.items()
+            },
+            # v2 - v1 for each metric, with an always-valid sequential p-value
+            "v2_vs_v1": {
+                metric: sequential_test(
+                    snap.ab_arm_stats["v1"].get(metric, StreamingMoments()),
+                    snap.ab_arm_stats["v2"].get(metric, StreamingMoments()),
+                )
+                for metric in AB_ARM_METRICS
+            } if "v1" in snap.ab_arm_stats and "v2" in snap.ab_arm_stats else {},
+        }
+
+        return {
+            "uptime_seconds": round(uptime_seconds, 2),
+            "requests": {
+                "total": snap.request_count,
+                "by_endpoint": dict(snap.request_count_by_endpoint),
+                "by_status": dict(snap.request_count_by_status),
+            },
+            "latencies": latencies_summary,
+            "stages": stages_summary,
+            "ab_tests": ab_summary,
+            "errors": {
+                "total": snap.error_count,
+                "by_type": dict(snap.error_count_by_type),
+            },
+            "windows": {
+                "endpoints": self._windows_summary("windows_by_endpoint"),
+                "arms": self._windows_summary("windows_by_arm"),
+            },
+            "gc": {
+                f"gen{gen}": dict(_latency_summary(stats), collected=self.gc_collected[gen])
+                for gen, stats in self.gc_pauses.items()
+            },
+        }
 
     def reset(self) -> None:
         """Reset all metrics (useful for testing)"""
-        with self._lock:
-            self.__init__()
+        with self._registry_lock:
+            self._shards = []
+            self._local = threading.local()
+            self.gc_pauses = {gen: LatencyStats() for gen in range(3)}
+            self.gc_collected = {gen: 0 for gen in range(3)}
+            self.start_time = time.time()
 
 
 # Global singleton instance
@@ -169,7 +624,25 @@ def record_ab_assignment(endpoint: str, arm: str) -> None:
 
 def record_request_latency(endpoint: str, latency_ms: float) -> None:
     """Convenience function to record request latency only (without full request details)"""
-    _metrics_collector.latencies_by_endpoint[endpoint].add_sample(latency_ms)
+    _metrics_collector.record_latency(endpoint, latency_ms)
+
+
+def record_ab_metrics(arm: str, latency_ms: Optional[float] = None,
+                      score: Optional[float] = None, similarity: Optional[float] = None,
+                      error: bool = False) -> None:
+    """Convenience function to record per-arm latency/score/similarity samples"""
+    _metrics_collector.record_ab_metrics(arm, latency_ms=latency_ms, score=score,
+                                         similarity=similarity, error=error)
+
+
+def record_stage_latencies(endpoint: str, stages: List[tuple]) -> None:
+    """Convenience function to record per-stage durations of one request"""
+    _metrics_collector.record_stage_latencies(endpoint, stages)
+
+
+def get_window_stats(endpoint: Optional[str] = None, arm: Optional[str] = None, window: str = "1m") -> Dict:
+    """Convenience function to get sliding-window stats for an endpoint or arm"""
+    return _metrics_collector.window_stats(endpoint=endpoint, arm=arm, window=window)
 
 
 def record_error(error_type: str) -> None:
@@ -0,0 +1,128 @@
+# Module: middleware.py
+"""
+Pure ASGI middleware for correlation IDs, timing, logging and metrics.
+
+Unlike `@app.middleware("http")` (Starlette's BaseHTTPMiddleware) it runs the
+app in the same task with no memory streams or response re-wrapping; the only
+interception is adding headers to the `http.response.start` message.
+"""
+import time
+import uuid
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.instrumentation.metrics import record_request, record_stage_latencies
+from app.instrumentation.slow_requests import build_entry, get_slow_request_buffer
+from app.instrumentation.tracing import start_trace
+from app.utils.logging import get_logger, log_request, log_response, set_correlation_id
+
+
+logger = get_logger(__name__)
+
+_CORRELATION_HEADER = b"x-correlation-id"
+
+# Metrics key for requests that matched no route (404 scans, requests shed before routing)
+UNMATCHED_ENDPOINT = "unmatched"
+
+
+def _endpoint(scope: Scope) -> str:
+    """Route template of the request (e.g. /api/v1/predict), so metric keys stay bounded"""
+    route = scope.get("route")
+    return route.path if route is not None else UNMATCHED_ENDPOINT
+
+
+class RequestInstrumentationMiddleware:
+    """Correlation ID tracking, logging, per-stage tracing and metrics for HTTP requests"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+
+        # Generate and set correlation ID
+        correlation_id = None
+        for name, value in scope["headers"]:
+            if name == _CORRELATION_HEADER:
+                correlation_id = value.decode("latin-1")
+                break
+        correlation_id = correlation_id or str(uuid.uuid4())
+        set_correlation_id(correlation_id)
+
+        # Log incoming request
+        log_request(logger, scope["method"], path, query_params=scope.get("query_string", b"").decode("latin-1"))
+
+        # Track request timing (overall and per stage)
+        trace = start_trace()
+        start_time = trace.started_at
+        status_code = 500
+        latency_ms = 0.0
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, latency_ms, response_started
+            if message["type"] == "http.response.start":
+                response_start = time.perf_counter()
+                response_started = True
+                status_code = message["status"]
+                latency_ms = (response_start - start_time) * 1000
+
+                # Add correlation ID to response headers
+                headers = MutableHeaders(scope=message)
+                headers["X-Correlation-ID"] = correlation_id
+
+                # Per-stage timings; time after the route returned is serialization
+                if trace.handler_end is not None:
+                    trace.add("serialize", (response_start - trace.handler_end) * 1000)
+                if trace.stages and settings.SERVER_TIMING_ENABLED:
+                    headers["Server-Timing"] = trace.server_timing()
+            await send(message)
+
+        try:
+            # Process request
+            await self.app(scope, receive, send_wrapper)
+
+        except Exception as e:
+            # Log error
+            logger.error(f"Request failed: {str(e)}", exc_info=True)
+            if response_started:
+                record_request(_endpoint(scope), status_code, latency_ms)
+                raise
+
+            # Record error metrics
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            record_request(_endpoint(scope), 500, latency_ms)
+
+            # Return error response
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": "Internal server error", "correlation_id": correlation_id},
+                headers={"X-Correlation-ID": correlation_id}
+            )
+            await response(scope, receive, send)
+            return
+
+        endpoint = _endpoint(scope)
+        if trace.stages:
+            record_stage_latencies(endpoint, trace.stages)
+
+        # Keep the slowest requests per endpoint for diagnostics; requests that matched no
+        # route are skipped
+        if endpoint != UNMATCHED_ENDPOINT:
+            get_slow_request_buffer().offer(
+                endpoint, latency_ms,
+                lambda: build_entry(correlation_id, status_code, trace),
+            )
+
+        # Log response
+        log_response(logger, status_code, latency_ms)
+
+        # Record metrics
+        record_request(endpoint, status_code, latency_ms)
@@ -0,0 +1,111 @@
+# Module: profiler.py
+"""
+In-process sampling profiler.
+
+Samples `sys._current_frames()` from a background thread at a fixed rate for a
+bounded duration and returns collapsed stacks ("frame;frame;frame count" per
+line), the input format of flamegraph.pl / speedscope / inferno.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+
+# Frames where a thread is parked rather than doing work; skipped in low-overhead mode
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("base_events.py", "_run_once"),
+    ("thread.py", "_worker"),
+    ("_thread.py", "run"),
+}
+
+LOW_OVERHEAD_MAX_HZ = 25
+LOW_OVERHEAD_MAX_DEPTH = 48
+
+# Only one profile may run at a time
+profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Bounded-duration stack sampler over all threads except its own"""
+
+    def __init__(self, duration_s: float, hz: int = 100, low_overhead: bool = False, max_depth: int = 128):
+        self.duration_s = duration_s
+        self.hz = min(hz, LOW_OVERHEAD_MAX_HZ) if low_overhead else hz
+        self.low_overhead = low_overhead
+        self.max_depth = min(max_depth, LOW_OVERHEAD_MAX_DEPTH) if low_overhead else max_depth
+        self.samples = 0
+        self._labels: Dict[object, str] = {}  # code object -> "module:function"
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = f"{module}:{code.co_name}"
+            self._labels[code] = label
+        return label
+
+    def _is_idle(self, frame) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.append(thread_name)
+        labels.reverse()
+        return ";".join(labels)
+
+    def run(self) -> str:
+        """Sample for duration_s (blocking) and return collapsed stacks"""
+        own_ident = threading.get_ident()
+        interval = 1.0 / self.hz
+        stacks: Counter = Counter()
+        names: Dict[int, str] = {}
+
+        deadline = time.perf_counter() + self.duration_s
+        next_sample = time.perf_counter()
+        while next_sample < deadline:
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                if self.low_overhead and self._is_idle(frame):
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    names.update((t.ident, t.name.replace(";", "_").replace(" ", "_")) for t in threading.enumerate())
+                    name = names.get(ident, f"thread-{ident}")
+                stacks[self._collapse(name, frame)] += 1
+            frames = frame = None  # drop frame references between samples
+            self.samples += 1
+
+            next_sample += interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def run_profile(duration_s: float, hz: int = 100, low_overhead: bool = False) -> Optional[str]:
+    """
+    Run a profile unless another one is in progress.
+
+    Returns:
+        Collapsed stacks, or None if a profile is already running
+    """
+    if not profile_lock.acquire(blocking=False):
+        return None
+    try:
+        return SamplingProfiler(duration_s, hz=hz, low_overhead=low_overhead).run()
+    finally:
+        profile_lock.release()
@@ -0,0 +1,135 @@
+# Module: prometheus.py
+"""
+Prometheus text-format exposition of MetricsCollector data.
+
+Metric headers and label fragments are pre-formatted once, and the classic
+histogram `le` buckets are precomputed as cut points into the collector's
+log-bucketed histograms, so a scrape is a merge of shards plus string joins.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from app.instrumentation.metrics import LatencyHistogram, LatencyStats, MetricsCollector
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Classic histogram bounds (seconds) for request latency
+LATENCY_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.25, 0.5, 1.0, 2.5, 5.0)
+# GC pauses are mostly sub-millisecond (gen0) with a long gen2 tail
+GC_PAUSE_BUCKETS_S = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _bucket_cutoffs(bounds_s: Tuple[float, ...]) -> List[Tuple[str, int]]:
+    """For each `le`, its label and the number of log buckets whose range lies at or below it"""
+    cutoffs = []
+    for bound_s in bounds_s:
+        bound_ms = bound_s * 1000
+        n = 0
+        while n < LatencyHistogram.NUM_BUCKETS and LatencyHistogram.bucket_value(n) <= bound_ms:
+            n += 1
+        cutoffs.append((f'{bound_s:g}', n))
+    return cutoffs
+
+
+_CUTOFFS = _bucket_cutoffs(LATENCY_BUCKETS_S)
+_GC_CUTOFFS = _bucket_cutoffs(GC_PAUSE_BUCKETS_S)
+
+_HEADERS = {
+    name: f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n"
+    for name, kind, help_text in (
+        ("mobupps_uptime_seconds", "gauge", "Seconds since the metrics collector started."),
+        ("mobupps_requests_total", "counter", "HTTP requests by endpoint."),
+        ("mobupps_responses_total", "counter", "HTTP responses by status code."),
+        ("mobupps_errors_total", "counter", "Requests that ended with a 4xx/5xx status or a recorded error."),
+        ("mobupps_request_duration_seconds", "histogram", "Request latency by endpoint."),
+        ("mobupps_stage_duration_seconds", "histogram", "Request stage latency by endpoint and stage."),
+        ("mobupps_ab_assignments_total", "counter", "A/B arm assignments by endpoint."),
+        ("mobupps_gc_pause_seconds", "histogram", "Garbage collection pauses by generation."),
+    )
+}
+
+
+@lru_cache(maxsize=1024)
+def _label(name: str, value: str) -> str:
+    escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return f'{name}="{escaped}"'
+
+
+def _histogram_lines(name: str, labels: str, stats: LatencyStats,
+                     cutoffs: List[Tuple[str, int]] = _CUTOFFS) -> List[str]:
+    """Cumulative `le` buckets, sum and count for one log-bucketed histogram"""
+    counts = stats.histogram.counts
+    lines = []
+    cumulative = 0
+    previous = 0
+    for le, cutoff in cutoffs:
+        cumulative += sum(counts[previous:cutoff])
+        previous = cutoff
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}\n')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.count}\n')
+    lines.append(f"{name}_sum{{{labels}}} {stats.total_ms / 1000:.6f}\n")
+    lines.append(f"{name}_count{{{labels}}} {stats.count}\n")
+    return lines
+
+
+def _gauge_header(name: str, help_text: str) -> str:
+    return f"# HELP {name} {help_text}\n# TYPE {name} gauge\n"
+
+
+def render_prometheus(collector: MetricsCollector, uptime_s: float,
+                      gauges: Iterable[Tuple[str, str, Dict[Tuple[Tuple[str, str], ...], float]]] = ()) -> str:
+    """
+    Render collector metrics in Prometheus text exposition format.
+
+    Args:
+        collector: Metrics collector to snapshot
+        uptime_s: Collector uptime in seconds
+        gauges: Extra (name, help, {label pairs: value}) gauges such as cache/index sizes
+    """
+    snap = collector.snapshot()
+    lines: List[str] = []
+    out = lines.append
+
+    out(_HEADERS["mobupps_uptime_seconds"])
+    out(f"mobupps_uptime_seconds {uptime_s:.3f}\n")
+
+    out(_HEADERS["mobupps_requests_total"])
+    for endpoint, count in snap.request_count_by_endpoint.items():
+        out(f"mobupps_requests_total{{{_label('endpoint', endpoint)}}} {count}\n")
+
+    out(_HEADERS["mobupps_responses_total"])
+    for status, count in snap.request_count_by_status.items():
+        out(f"mobupps_responses_total{{{_label('status', status)}}} {count}\n")
+
+    out(_HEADERS["mobupps_errors_total"])
+    out(f"mobupps_errors_total {snap.error_count}\n")
+
+    out(_HEADERS["mobupps_request_duration_seconds"])
+    for endpoint, stats in snap.latencies_by_endpoint.items():
+        lines.extend(_histogram_lines("mobupps_request_duration_seconds", _label("endpoint", endpoint), stats))
+
+    out(_HEADERS["mobupps_stage_duration_seconds"])
+    for endpoint, stages in snap.stage_latencies.items():
+        ep = _label("endpoint", endpoint)
+        for stage, stats in stages.items():
+            labels = f"{ep},{_label('stage', stage)}"
+            lines.extend(_histogram_lines("mobupps_stage_duration_seconds", labels, stats))
+
+    out(_HEADERS["mobupps_ab_assignments_total"])
+    for endpoint, arms in snap.ab_assignments_by_endpoint.items():
+        ep = _label("endpoint", endpoint)
+        for arm, count in arms.items():
+            out(f"mobupps_ab_assignments_total{{{ep},{_label('arm', arm)}}} {count}\n")
+
+    out(_HEADERS["mobupps_gc_pause_seconds"])
+    for gen, stats in collector.gc_pauses.items():
+        lines.extend(_histogram_lines("mobupps_gc_pause_seconds", _label("generation", gen), stats, _GC_CUTOFFS))
+
+    for name, help_text, samples in gauges:
+        out(_gauge_header(name, help_text))
+        for labels, value in samples.items():
+            label_str = ",".join(_label(k, v) for k, v in labels)
+            out(f"{name}{{{label_str}}} {value}\n" if label_str else f"{name} {value}\n")
+
+    return "".join(lines)
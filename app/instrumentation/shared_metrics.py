@@ -0,0 +1,217 @@
+# Module: shared_metrics.py
+"""
+Cross-worker metrics through mmap-backed files.
+
+Each worker process owns one fixed-layout file of uint64 counters (request
+counts, status classes, A/B arm counts and per-endpoint latency histogram
+buckets) in METRICS_SHM_DIR, ideally on tmpfs such as /dev/shm. A background
+thread copies the worker's MetricsCollector snapshot into its file; /metrics
+maps every worker's file and sums them, so fleet totals and fleet percentiles
+need no IPC round trips.
+"""
+import array
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.instrumentation.metrics import LatencyHistogram, MetricsCollector
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+MAGIC = 0x31305445_4D50424D  # "MBPMET01"
+TRACKED_ENDPOINTS = ("/api/v1/find-similar", "/api/v1/predict", "/healthz", "/metrics", "other")
+TRACKED_ARMS = ("v1", "v2", "other")
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+# Layout (uint64 slots)
+_HEADER = ("magic", "seq", "pid", "updated_ms")
+_GLOBALS = ("requests", "errors")
+_ENDPOINT_FIELDS = ("count", "total_us")
+_ENDPOINT_SLOTS = len(_ENDPOINT_FIELDS) + LatencyHistogram.NUM_BUCKETS
+
+OFF_SEQ = _HEADER.index("seq")
+OFF_GLOBALS = len(_HEADER)
+OFF_STATUS = OFF_GLOBALS + len(_GLOBALS)
+OFF_ARMS = OFF_STATUS + len(STATUS_CLASSES)
+OFF_ENDPOINTS = OFF_ARMS + len(TRACKED_ARMS)
+NUM_SLOTS = OFF_ENDPOINTS + len(TRACKED_ENDPOINTS) * _ENDPOINT_SLOTS
+FILE_SIZE = NUM_SLOTS * 8
+
+
+def _endpoint_index(endpoint: str) -> int:
+    try:
+        return TRACKED_ENDPOINTS.index(endpoint)
+    except ValueError:
+        return len(TRACKED_ENDPOINTS) - 1
+
+
+def _arm_index(arm: str) -> int:
+    try:
+        return TRACKED_ARMS.index(arm)
+    except ValueError:
+        return len(TRACKED_ARMS) - 1
+
+
+class SharedMetricsWriter:
+    """Periodically publishes one worker's metrics into its mmap-backed slot file"""
+
+    def __init__(self, directory: str, collector: MetricsCollector,
+                 interval_s: float = 1.0, worker_id: Optional[str] = None):
+        self.path = Path(directory) / f"worker-{worker_id or os.getpid()}.bin"
+        self.collector = collector
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.truncate(FILE_SIZE)
+        self._file = open(self.path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), FILE_SIZE)
+        self._slots = memoryview(self._mmap).cast("Q")
+        self._slots[0] = MAGIC
+        self._slots[2] = os.getpid()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="shared-metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop publishing and remove this worker's file"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval_s * 2)
+        self._slots.release()
+        self._mmap.close()
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to publish shared metrics: {str(e)}")
+
+    def flush(self) -> None:
+        """Copy the collector's current totals into the shared file"""
+        snap = self.collector.snapshot()
+        values = [0] * NUM_SLOTS
+
+        values[OFF_GLOBALS] = snap.request_count
+        values[OFF_GLOBALS + 1] = snap.error_count
+        for status, count in snap.request_count_by_status.items():
+            cls = min(max(int(status) // 100, 1), 5) - 1
+            values[OFF_STATUS + cls] += count
+        for arm, count in snap.ab_assignments.items():
+            values[OFF_ARMS + _arm_index(arm)] += count
+        for endpoint, stats in snap.latencies_by_endpoint.items():
+            base = OFF_ENDPOINTS + _endpoint_index(endpoint) * _ENDPOINT_SLOTS
+            values[base] += stats.count
+            values[base + 1] += int(stats.total_ms * 1000)
+            hist_base = base + len(_ENDPOINT_FIELDS)
+            for i, count in enumerate(stats.histogram.counts):
+                if count:
+                    values[hist_base + i] += count
+
+        # Seqlock: odd sequence while writing so readers retry torn copies
+        slots = self._slots
+        slots[OFF_SEQ] += 1
+        slots[OFF_GLOBALS:] = memoryview(array.array("Q", values[OFF_GLOBALS:]).tobytes()).cast("Q")
+        slots[3] = int(time.time() * 1000)
+        slots[OFF_SEQ] += 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_slots(path: Path, retries: int = 5) -> Optional[memoryview]:
+    """Consistent copy of a worker file's slots (None if unreadable)"""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), FILE_SIZE, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+    with mm:
+        live = memoryview(mm).cast("Q")
+        try:
+            for _ in range(retries):
+                seq = live[OFF_SEQ]
+                if seq % 2 == 0:
+                    copy = memoryview(bytearray(live.tobytes())).cast("Q")
+                    if live[OFF_SEQ] == seq:
+                        return copy
+                time.sleep(0.0001)
+            return None
+        finally:
+            live.release()
+
+
+def read_fleet_summary(directory: str) -> Dict:
+    """
+    Aggregate every live worker's counters and latency histograms.
+
+    Files left by dead workers are removed.
+    """
+    totals = [0] * NUM_SLOTS
+    workers = 0
+    for path in sorted(Path(directory).glob("worker-*.bin")):
+        try:
+            slots = _read_slots(path)
+        except OSError:
+            continue
+        if slots is None or slots[0] != MAGIC:
+            continue
+        if not _pid_alive(slots[2]):
+            path.unlink(missing_ok=True)
+            continue
+        workers += 1
+        for i in range(OFF_GLOBALS, NUM_SLOTS):
+            value = slots[i]
+            if value:
+                totals[i] += value
+
+    latencies = {}
+    for e, endpoint in enumerate(TRACKED_ENDPOINTS):
+        base = OFF_ENDPOINTS + e * _ENDPOINT_SLOTS
+        count = totals[base]
+        if not count:
+            continue
+        hist_base = base + len(_ENDPOINT_FIELDS)
+        histogram = LatencyHistogram()
+        histogram.counts = totals[hist_base:hist_base + LatencyHistogram.NUM_BUCKETS]
+        histogram.count = count
+        latencies[endpoint] = {
+            "count": count,
+            "avg_ms": round(totals[base + 1] / 1000 / count, 2),
+            "p50_ms": round(histogram.quantile(0.50), 2),
+            "p95_ms": round(histogram.quantile(0.95), 2),
+            "p99_ms": round(histogram.quantile(0.99), 2),
+        }
+
+    return {
+        "workers": workers,
+        "requests": {
+            "total": totals[OFF_GLOBALS],
+            "by_status_class": {
+                cls: totals[OFF_STATUS + i] for i, cls in enumerate(STATUS_CLASSES) if totals[OFF_STATUS + i]
+            },
+        },
+        "errors": {"total": totals[OFF_GLOBALS + 1]},
+        "latencies": latencies,
+        "ab_tests": {
+            "by_arm": {arm: totals[OFF_ARMS + i] for i, arm in enumerate(TRACKED_ARMS) if totals[OFF_ARMS + i]},
+        },
+    }
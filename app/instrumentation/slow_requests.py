@@ -0,0 +1,125 @@
+# Module: slow_requests.py
+"""
+Capture of the slowest requests per endpoint over a rolling window.
+
+Each endpoint keeps a min-heap of at most N entries keyed by latency. Requests
+faster than the current N-th slowest are rejected with one comparison; the
+entry (stage timings, arm, filter shape, payload fingerprint) is only built
+for requests that make it into the buffer.
+"""
+import hashlib
+import heapq
+import itertools
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from app.instrumentation.tracing import RequestTrace
+
+
+class SlowRequestBuffer:
+    """Top-N slowest requests per endpoint within the last window_s seconds"""
+
+    def __init__(self, per_endpoint: int = 20, window_s: float = 900.0):
+        self.per_endpoint = per_endpoint
+        self.window_s = window_s
+        self._lock = Lock()
+        self._heaps: Dict[str, List[tuple]] = {}  # endpoint -> [(latency_ms, seq, entry)]
+        self._seq = itertools.count()
+
+    def _purge(self, heap: List[tuple], now: float) -> None:
+        cutoff = now - self.window_s
+        if any(entry["timestamp"] < cutoff for _, _, entry in heap):
+            heap[:] = [item for item in heap if item[2]["timestamp"] >= cutoff]
+            heapq.heapify(heap)
+
+    def offer(self, endpoint: str, latency_ms: float, build: Callable[[], Dict[str, Any]]) -> bool:
+        """
+        Consider a finished request; `build` is only called if it is admitted.
+
+        Returns:
+            True if the request was stored
+        """
+        heap = self._heaps.get(endpoint)
+        if heap is not None and len(heap) >= self.per_endpoint:
+            # Fast path without the lock: not slower than the fastest stored (still live) entry
+            try:
+                fastest_ms, _, fastest = heap[0]
+            except IndexError:
+                fastest_ms, fastest = None, None
+            if fastest is not None and latency_ms <= fastest_ms and fastest["timestamp"] >= time.time() - self.window_s:
+                return False
+
+        now = time.time()
+        with self._lock:
+            heap = self._heaps.setdefault(endpoint, [])
+            self._purge(heap, now)
+            if len(heap) >= self.per_endpoint and latency_ms <= heap[0][0]:
+                return False
+            entry = build()
+            entry.update(endpoint=endpoint, latency_ms=round(latency_ms, 2), timestamp=now)
+            item = (latency_ms, next(self._seq), entry)
+            if len(heap) >= self.per_endpoint:
+                heapq.heapreplace(heap, item)
+            else:
+                heapq.heappush(heap, item)
+            return True
+
+    def snapshot(self, endpoint: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Stored requests per endpoint, slowest first"""
+        now = time.time()
+        with self._lock:
+            result = {}
+            for name, heap in self._heaps.items():
+                if endpoint is not None and name != endpoint:
+                    continue
+                self._purge(heap, now)
+                result[name] = [entry for _, _, entry in sorted(heap, key=lambda item: item[0], reverse=True)]
+            return result
+
+
+def payload_fingerprint(payload: Any) -> Optional[str]:
+    """Short stable hash of a request body model (or raw bytes)"""
+    if payload is None:
+        return None
+    if hasattr(payload, "model_dump_json"):
+        payload = payload.model_dump_json()
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def filter_shape(filters: Optional[Dict[str, List[str]]]) -> Optional[Dict[str, int]]:
+    """Filter keys with their value counts, without the values themselves"""
+    if not filters:
+        return None
+    return {key: len(values or []) for key, values in filters.items()}
+
+
+def build_entry(correlation_id: str, status_code: int, trace: RequestTrace) -> Dict[str, Any]:
+    """Slow-request entry from a finished request's trace"""
+    annotations = trace.annotations
+    return {
+        "correlation_id": correlation_id,
+        "status_code": status_code,
+        "arm": annotations.get("arm"),
+        "top_k": annotations.get("top_k"),
+        "filter_shape": filter_shape(annotations.get("filters")),
+        "stages_ms": {name: round(ms, 3) for name, ms in trace.stages},
+        "payload_hash": payload_fingerprint(annotations.get("payload")),
+    }
+
+
+# Global singleton instance
+_slow_requests = SlowRequestBuffer()
+
+
+def get_slow_request_buffer() -> SlowRequestBuffer:
+    """Get the global slow-request buffer"""
+    return _slow_requests
+
+
+def configure_slow_requests(per_endpoint: int, window_s: float) -> None:
+    """Resize the global buffer (clears stored entries)"""
+    global _slow_requests
+    _slow_requests = SlowRequestBuffer(per_endpoint, window_s)
@@ -0,0 +1,76 @@
+# Module: tracing.py
+"""
+Lightweight per-stage request tracing.
+
+The middleware starts a RequestTrace for each request and stores it in a
+context variable; code on the request path wraps its stages in
+`with trace_stage("name"):`. Stage durations are recorded into per-stage
+histograms and can be returned in a Server-Timing header. Outside a traced
+request trace_stage is a no-op.
+"""
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RequestTrace:
+    """Stage timings (ms) collected for one request"""
+    __slots__ = ("stages", "annotations", "handler_end", "started_at")
+
+    def __init__(self):
+        self.started_at = perf_counter()  # request arrival, before any admission queueing
+        self.stages: List[Tuple[str, float]] = []
+        self.annotations: Dict[str, Any] = {}
+        self.handler_end: Optional[float] = None
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.stages.append((name, duration_ms))
+
+    def mark_handler_end(self) -> None:
+        """Mark the end of route code; the rest until the response starts is serialization"""
+        self.handler_end = perf_counter()
+
+    def server_timing(self) -> str:
+        """Stages formatted as a Server-Timing header value"""
+        return ", ".join(f"{name};dur={duration_ms:.2f}" for name, duration_ms in self.stages)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_trace() -> RequestTrace:
+    """Start a trace for the current request context"""
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def get_trace() -> Optional[RequestTrace]:
+    """Trace of the current request, if any"""
+    return _current_trace.get()
+
+
+def annotate(**fields: Any) -> None:
+    """Attach request attributes (arm, top_k, ...) to the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.annotations.update(fields)
+
+
+class trace_stage:
+    """Context manager timing one stage of the current request"""
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace = _current_trace.get()
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            self.trace.add(self.name, (perf_counter() - self.start) * 1000)
+        return False
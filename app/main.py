@@ -1,20 +1,60 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import uuid
+import asyncio
 import time
-import pandas as pd
-import os
+from app.routers.admin import router as admin_router
 from app.routers.health import router as health_router
-from app.routers.api_v1 import router as api_v1_router
+from app.routers.api_v1 import router as api_v1_router, _ab, _emb_store, _sim
+from app.services.performance_data import PerformanceAggregator
+from app.services.warmup import Readiness, load_concurrently, warm_up
+from app.utils.admission import AdmissionControlMiddleware, build_limiters, get_admission_stats
+from app.utils.bulkheads import bulkhead_stats, configure_blas_threads, configure_bulkheads, shutdown_bulkheads
 from app.utils.data_loader import ensure_data_files
-from app.utils.logging import setup_logging, set_correlation_id, get_logger, log_request, log_response
-from app.instrumentation.metrics import record_request, get_metrics_summary
+from app.utils.logging import setup_logging, stop_logging, get_logger
+from app.instrumentation.metrics import get_metrics_summary, get_metrics_collector
+from app.instrumentation.middleware import RequestInstrumentationMiddleware
+from app.instrumentation.slow_requests import configure_slow_requests
+from app.instrumentation.shared_metrics import SharedMetricsWriter, read_fleet_summary
+from app.instrumentation.prometheus import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, render_prometheus
+from app.instrumentation.ab_events import start_ab_event_log, stop_ab_event_log
+from app.instrumentation.gc_monitor import configure_gc, freeze_heap, install_gc_monitor
 from app.config import settings
 
 
 app = FastAPI(title="MobUpps – AB Similarity & Predict API", version="1.0.0")
 logger = get_logger(__name__)
+readiness = Readiness()
+
+# Before numpy is first imported (embedding loads), so the BLAS env limits apply
+configure_blas_threads(settings.BLAS_THREADS)
+
+# Isolate find-similar per arm and predict from each other and from the default threadpool
+if settings.BULKHEADS_ENABLED:
+    configure_bulkheads({
+        "find_similar:v1": settings.BULKHEAD_FIND_SIMILAR_WORKERS,
+        "find_similar:v2": settings.BULKHEAD_FIND_SIMILAR_WORKERS,
+        "predict": settings.BULKHEAD_PREDICT_WORKERS,
+    }, max_queue=settings.BULKHEAD_MAX_QUEUE)
+
+# Shed load on the scoring endpoints before it queues up in the threadpool (added before
+# CORS so CORS wraps it and shed 503s still carry Access-Control-Allow-Origin)
+app.state.admission_limiters = {}
+if settings.ADMISSION_ENABLED:
+    app.state.admission_limiters = build_limiters(
+        ["/api/v1/find-similar", "/api/v1/predict"],
+        initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+        min_limit=settings.ADMISSION_MIN_LIMIT,
+        max_limit=settings.ADMISSION_MAX_LIMIT,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        queue_timeout_s=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+        target_latency_ms=settings.ADMISSION_TARGET_LATENCY_MS,
+    )
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        limiters=app.state.admission_limiters,
+        retry_after_s=settings.ADMISSION_RETRY_AFTER_S,
+    )
 
 # Configure CORS
 app.add_middleware(
@@ -23,8 +63,12 @@ app.add_middleware(
     allow_credentials=settings.CORS_ALLOW_CREDENTIALS,
     allow_methods=settings.CORS_ALLOW_METHODS,
     allow_headers=settings.CORS_ALLOW_HEADERS,
+    expose_headers=settings.CORS_EXPOSE_HEADERS,
 )
 
+# Correlation IDs, logging and metrics (added last so it wraps everything, incl. shed requests)
+app.add_middleware(RequestInstrumentationMiddleware)
+
 
 def load_performance_data_cache():
     """
@@ -33,109 +77,209 @@ def load_performance_data_cache():
     Returns:
         Dict mapping app_id to performance metrics
     """
-    perf_path = 'data/historical_performance.csv'
-    if os.path.exists(perf_path):
+    aggregator = PerformanceAggregator(
+        settings.HIST_PERF_PATH,
+        settings.HIST_PERF_PARTITIONS_DIR,
+        date_column=settings.HIST_PERF_DATE_COLUMN,
+        decay_half_life_days=settings.CTR_DECAY_HALF_LIFE_DAYS,
+        partition_settle_s=settings.PERF_PARTITION_SETTLE_S,
+    )
+    app.state.performance_aggregator = aggregator
+    try:
+        return aggregator.load()
+    except Exception as e:
+        logger.error(f"Error loading performance data: {str(e)}")
+        return {}
+
+
+def preload_data():
+    """
+    Load both embedding arms, app metadata and performance data concurrently,
+    then run warm-up queries and mark the instance ready. Idempotent.
+    """
+    if readiness.ready:
+        return
+    try:
+        results = load_concurrently({
+            "embeddings_v1": _emb_store.load_v1,
+            "embeddings_v2": _emb_store.load_v2,
+            "metadata": _sim.ensure_metadata,
+            "performance_data": load_performance_data_cache,
+        }, readiness)
+        app.state.performance_data_cache = results["performance_data"]
+
+        start = time.perf_counter()
+        queries = warm_up(_emb_store, _sim, app.state.performance_data_cache,
+                          rounds=settings.WARMUP_ROUNDS, top_k=settings.DEFAULT_TOP_K)
+        readiness.record("warmup", (time.perf_counter() - start) * 1000)
+
+        # Everything loaded so far lives for the whole process: stop rescanning it
+        if settings.GC_FREEZE_AFTER_LOAD:
+            freeze_heap()
+        readiness.mark_ready()
+        logger.info(f"Data preloaded and warmed up ({queries} queries): {readiness.load_timings_ms}")
+    except Exception as e:
+        readiness.mark_failed(str(e))
+        logger.error(f"Error preloading data: {str(e)}", exc_info=True)
+
+
+async def refresh_performance_data_loop(interval_s: float):
+    """Periodically fold new daily partitions and swap the cache atomically"""
+    while True:
+        await asyncio.sleep(interval_s)
+        aggregator: PerformanceAggregator = getattr(app.state, "performance_aggregator", None)
+        if aggregator is None:
+            continue
         try:
-            logger.info(f"Loading performance data from {perf_path}...")
-            df = pd.read_csv(perf_path)
-
-            # Validate required columns
-            required_cols = ['app_id', 'clicks', 'impressions']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                logger.error(f"Missing required columns: {missing_cols}")
-                return {}
-
-            # Aggregate performance metrics by app_id
-            agg = df.groupby('app_id').agg({
-                'clicks': 'sum',
-                'impressions': 'sum',
-                'event_count': 'sum' if 'event_count' in df.columns else 'count',
-                'mmp_offer_default_revenue': 'mean' if 'mmp_offer_default_revenue' in df.columns else 'mean'
-            }).reset_index()
-
-            # Calculate CTR (Click-Through Rate) as performance score
-            agg['ctr'] = agg['clicks'] / (agg['impressions'] + 1)
-
-            perf_data = agg.set_index('app_id').to_dict('index')
-            logger.info(f"Cached performance data for {len(perf_data)} apps")
-            return perf_data
+            snapshot = await asyncio.to_thread(aggregator.refresh)
+            if snapshot is not None:
+                # Single attribute assignment: readers see either the old or the new dict
+                app.state.performance_data_cache = snapshot
+        except Exception as e:
+            logger.error(f"Error refreshing performance data: {str(e)}")
+
 
+async def reload_experiments_loop(path: str, interval_s: float):
+    """Hot-reload layered experiment weights when the config file changes"""
+    while True:
+        try:
+            _ab.engine.reload_if_changed(path)
         except Exception as e:
-            logger.error(f"Error loading performance data: {str(e)}")
-            return {}
-    else:
-        logger.warning(f"Performance data file not found: {perf_path}")
-        return {}
+            logger.error(f"Error reloading experiment config: {str(e)}")
+        await asyncio.sleep(interval_s)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
-    # Setup logging (structured=False for colored console in development)
-    setup_logging(level="INFO", structured=False)
+    # Setup logging (LOG_STRUCTURED=False for colored console in development)
+    setup_logging(
+        level=settings.LOG_LEVEL,
+        structured=settings.LOG_STRUCTURED,
+        queued=settings.LOG_QUEUED,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        sample_rates=settings.LOG_SAMPLE_RATES,
+    )
     logger.info("Starting MobUpps API...")
 
-    # Download data files from Google Drive on startup
-    ensure_data_files()
-    logger.info("Data files loaded successfully")
+    configure_gc(settings.GC_THRESHOLDS)
+    if settings.GC_MONITOR_ENABLED:
+        install_gc_monitor(get_metrics_collector())
 
-    # Cache performance data for fast predictions
-    app.state.performance_data_cache = load_performance_data_cache()
+    configure_slow_requests(settings.SLOW_REQUESTS_PER_ENDPOINT, settings.SLOW_REQUESTS_WINDOW_S)
 
+    if readiness.ready:
+        # Forked by app.server: data was loaded, warmed up and frozen in the master
+        logger.info("Using data preloaded by the server master")
+    else:
+        # Download data files from Google Drive on startup
+        ensure_data_files()
+        logger.info("Data files loaded successfully")
+
+        if settings.EAGER_LOAD:
+            # Load indexes, metadata and performance data off the event loop; /readyz reports
+            # ready once they are loaded and warmed up (/healthz is liveness only)
+            app.state.preload_task = asyncio.create_task(asyncio.to_thread(preload_data))
+        else:
+            # Cache performance data for fast predictions; indexes load on first use
+            app.state.performance_data_cache = load_performance_data_cache()
+            if settings.GC_FREEZE_AFTER_LOAD:
+                freeze_heap()
+            readiness.mark_ready()
+
+    # Pick up new daily partitions without a restart
+    if settings.PERF_REFRESH_INTERVAL_S > 0:
+        app.state.performance_refresh_task = asyncio.create_task(
+            refresh_performance_data_loop(settings.PERF_REFRESH_INTERVAL_S)
+        )
 
-@app.middleware("http")
-async def logging_and_metrics_middleware(request: Request, call_next):
-    """Middleware for correlation ID tracking, logging, and metrics"""
-    # Generate and set correlation ID
-    correlation_id = request.headers.get("X-Correlation-ID") or str(uuid.uuid4())
-    set_correlation_id(correlation_id)
+    if settings.AB_EVENTS_ENABLED:
+        start_ab_event_log(
+            settings.AB_EVENTS_DIR,
+            queue_size=settings.AB_EVENTS_QUEUE_SIZE,
+            batch_size=settings.AB_EVENTS_BATCH_SIZE,
+            max_file_bytes=settings.AB_EVENTS_MAX_FILE_MB * 1024 * 1024,
+        )
 
-    # Log incoming request
-    log_request(logger, request.method, request.url.path, query_params=str(request.query_params))
+    if settings.METRICS_SHM_DIR:
+        app.state.shared_metrics_writer = SharedMetricsWriter(
+            settings.METRICS_SHM_DIR,
+            get_metrics_collector(),
+            interval_s=settings.METRICS_SHM_FLUSH_INTERVAL_S,
+        )
+        app.state.shared_metrics_writer.start()
 
-    # Track request timing
-    start_time = time.perf_counter()
+    if settings.AB_EXPERIMENTS_PATH:
+        app.state.experiments_reload_task = asyncio.create_task(
+            reload_experiments_loop(settings.AB_EXPERIMENTS_PATH, settings.AB_RELOAD_INTERVAL_S)
+        )
 
-    try:
-        # Process request
-        response = await call_next(request)
 
-        # Calculate latency
-        latency_ms = (time.perf_counter() - start_time) * 1000
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    for name in ("preload_task", "performance_refresh_task", "experiments_reload_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
 
-        # Add correlation ID to response headers
-        response.headers["X-Correlation-ID"] = correlation_id
+    stop_ab_event_log()
+    shutdown_bulkheads()
 
-        # Log response
-        log_response(logger, response.status_code, latency_ms)
+    writer = getattr(app.state, "shared_metrics_writer", None)
+    if writer is not None:
+        writer.stop()
 
-        # Record metrics
-        record_request(request.url.path, response.status_code, latency_ms)
+    stop_logging()
 
-        return response
 
-    except Exception as e:
-        # Log error
-        latency_ms = (time.perf_counter() - start_time) * 1000
-        logger.error(f"Request failed: {str(e)}", exc_info=True)
-
-        # Record error metrics
-        record_request(request.url.path, 500, latency_ms)
-
-        # Return error response
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal server error", "correlation_id": correlation_id},
-            headers={"X-Correlation-ID": correlation_id}
-        )
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once data is loaded and warmed up, else 503; includes index sizes and load timings"""
+    body = readiness.as_dict()
+    body["index_sizes"] = _emb_store.loaded_sizes()
+    body["metadata_apps"] = _sim.metadata_size()
+    body["performance_cache_apps"] = len(getattr(app.state, "performance_data_cache", None) or {})
+    return JSONResponse(body, status_code=200 if readiness.ready else 503)
 
 
 @app.get("/metrics")
-async def metrics_endpoint():
-    """Expose collected metrics"""
-    return get_metrics_summary()
+def metrics_endpoint():
+    """
+    Expose collected metrics (plus fleet-wide totals when cross-worker metrics are enabled).
+
+    A plain def so the scrape (shard merge, reading every worker's mmap file with
+    seqlock retries) runs in the threadpool instead of blocking the event loop.
+    """
+    summary = get_metrics_summary()
+    summary["admission"] = get_admission_stats(app.state.admission_limiters)
+    summary["bulkheads"] = bulkhead_stats()
+    if settings.METRICS_SHM_DIR:
+        summary["fleet"] = read_fleet_summary(settings.METRICS_SHM_DIR)
+    return summary
+
+
+@app.get("/metrics/prometheus", response_class=PlainTextResponse)
+def prometheus_metrics_endpoint():
+    """Expose collected metrics in Prometheus text format"""
+    collector = get_metrics_collector()
+    perf_cache = getattr(app.state, "performance_data_cache", None) or {}
+    gauges = [
+        ("mobupps_performance_cache_apps", "Apps in the cached performance data.",
+         {(): len(perf_cache)}),
+        ("mobupps_embeddings_loaded", "Embeddings loaded per A/B arm.",
+         {(("arm", arm),): size for arm, size in _emb_store.loaded_sizes().items()}),
+    ]
+    bulkheads = bulkhead_stats()
+    for field, help_text in (("queued", "Calls waiting for a bulkhead thread."),
+                             ("active", "Calls running on a bulkhead thread."),
+                             ("rejected", "Calls refused because the bulkhead queue was full.")):
+        gauges.append((f"mobupps_bulkhead_{field}", help_text,
+                       {(("bulkhead", name),): stats[field] for name, stats in bulkheads.items()}))
+    body = render_prometheus(collector, time.time() - collector.start_time, gauges)
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 app.include_router(health_router)
-app.include_router(api_v1_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(api_v1_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/admin")
\ No newline at end of file
@@ -0,0 +1,35 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.models.schemas import Neighbor
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class NeighborBatch:
+    """Top-k search result as parallel columns (row i is one neighbor), sorted by similarity"""
+    ids: List[str] = field(default_factory=list)
+    sims: List[float] = field(default_factory=list)
+    names: List[Optional[str]] = field(default_factory=list)
+    categories: List[Optional[str]] = field(default_factory=list)
+    degraded: bool = False  # scoring stopped early at the request deadline
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mean_similarity(self) -> Optional[float]:
+        return sum(self.sims) / len(self.sims) if self.sims else None
+
+    def to_neighbors(self) -> List[Neighbor]:
+        """Validated Neighbor models (rows that fail validation are dropped)"""
+        neighbors = []
+        for app_id, sim, app_name, category in zip(self.ids, self.sims, self.names, self.categories):
+            try:
+                neighbors.append(Neighbor(app_id=app_id, similarity=float(sim), app_name=app_name, category=category))
+            except Exception as e:
+                logger.warning(f"Error building neighbor for app_id {app_id}: {str(e)}")
+                continue
+        return neighbors
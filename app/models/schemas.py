@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 
 class AppMeta(BaseModel):
@@ -16,6 +16,8 @@ class SimilarRequest(BaseModel):
     top_k: Optional[int] = Field(default=None, ge=1, le=100)
     partner_id: Optional[str] = None
     app_id: Optional[str] = None
+    # Time budget in ms from arrival (also accepted as the X-Request-Deadline-Ms header)
+    deadline_ms: Optional[float] = Field(default=None, gt=0)
 
 
 class Neighbor(BaseModel):
@@ -28,12 +30,16 @@ class Neighbor(BaseModel):
 class SimilarResponse(BaseModel):
     neighbors: List[Neighbor]
     ab_arm: str
+    degraded: bool = False  # partial top-k: the deadline cut scoring short
 
 
 class PredictRequest(BaseModel):
     app: AppMeta
     neighbors: List[Neighbor]
     ab_arm: str
+    partner_id: Optional[str] = None
+    app_id: Optional[str] = None
+    ctr_window: Literal["lifetime", "7d", "30d", "90d", "decayed"] = "lifetime"
 
 
 class Prediction(BaseModel):
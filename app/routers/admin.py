@@ -0,0 +1,58 @@
+# Module: admin.py
+import asyncio
+import hmac
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.instrumentation.profiler import run_profile
+from app.instrumentation.slow_requests import get_slow_request_buffer
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin routes are disabled unless ADMIN_ENABLED and ADMIN_TOKEN are set; X-Admin-Token must match"""
+    if not settings.ADMIN_ENABLED or not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/slow-requests")
+def slow_requests(endpoint: Optional[str] = None):
+    """Slowest recent requests per endpoint with correlation IDs, stage timings and payload hashes"""
+    buffer = get_slow_request_buffer()
+    return {
+        "window_s": buffer.window_s,
+        "per_endpoint": buffer.per_endpoint,
+        "endpoints": buffer.snapshot(endpoint),
+    }
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    duration_s: float = Query(default=10.0, gt=0),
+    hz: int = Query(default=100, ge=1, le=1000),
+    mode: Literal["low", "full"] = "low",
+):
+    """
+    Sample all request threads for duration_s and return collapsed stacks
+    (render with flamegraph.pl, speedscope or inferno).
+
+    mode=low caps the rate and stack depth and skips idle threads; it is the
+    one intended for production traffic.
+    """
+    if duration_s > settings.PROFILER_MAX_DURATION_S:
+        raise HTTPException(
+            status_code=400,
+            detail=f"duration_s must be at most {settings.PROFILER_MAX_DURATION_S}",
+        )
+
+    stacks = await asyncio.to_thread(run_profile, duration_s, hz, mode == "low")
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(stacks)
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
 from time import perf_counter
+import math
 from app.models.schemas import SimilarRequest, SimilarResponse, PredictRequest, PredictResponse
 from app.config import settings
-from app.services.ab_test import ABTestController, ABPolicy
+from app.services.ab_test import ABTestController, ABPolicy, MODEL_LAYER
 from app.services.embeddings import EmbeddingsStore
 from app.services.similarity import SimilarityService
 from app.services.predictor import PerformancePredictor
-from app.utils.logging import get_logger, log_ab_assignment
-from app.instrumentation.metrics import record_ab_assignment, record_request_latency
+from app.utils.logging import get_logger, log_ab_assignment, should_log
+from app.instrumentation.metrics import record_ab_assignment, record_request_latency, record_ab_metrics
+from app.instrumentation.ab_events import record_ab_exposure, record_ab_outcome
+from app.instrumentation.tracing import trace_stage, get_trace, annotate
+from app.utils.responses import FastJSONResponse, encode_similar
+from app.utils.binary_format import MEDIA_TYPE as NEIGHBORS_MEDIA_TYPE, accepts_binary, encode_neighbors
+from app.utils.bulkheads import BulkheadFull, run_in_bulkhead
 
 
 router = APIRouter()
@@ -15,71 +22,182 @@ logger = get_logger(__name__)
 
 
 _emb_store = EmbeddingsStore(settings.EMB_V1_PATH, settings.EMB_V2_PATH)
-_ab = ABTestController(ABPolicy(v1_weight=settings.AB_SPLIT_V1, sticky=True))
-_sim = SimilarityService(_emb_store)
+_ab = ABTestController(ABPolicy(v1_weight=settings.AB_SPLIT_V1, sticky=True,
+                               legacy_md5=settings.AB_LEGACY_MD5_BUCKETING))
+_sim = SimilarityService(_emb_store, settings.APP_METADATA_PATH)
 
 
-@router.post("/find-similar", response_model=SimilarResponse)
-def find_similar(req: SimilarRequest):
+DEADLINE_HEADER = "x-request-deadline-ms"
+
+
+def _deadline(arrival: float, req: SimilarRequest, request: Request) -> float | None:
+    """
+    perf_counter() time by which scoring must finish, from the deadline_ms field
+    and/or the X-Request-Deadline-Ms header (the tighter one wins), measured from
+    the request's arrival.
+
+    Raises:
+        HTTPException: 400 if the header is not a positive number
+    """
+    budgets = [req.deadline_ms] if req.deadline_ms else []
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is not None:
+        try:
+            budget = float(header)
+        except ValueError:
+            budget = 0.0
+        if not budget > 0:
+            raise HTTPException(status_code=400, detail="X-Request-Deadline-Ms must be a positive number")
+        budgets.append(budget)
+    if not budgets:
+        return None
+    # Leave room to join metadata and serialize the response after scoring stops
+    return arrival + (min(budgets) - settings.DEADLINE_RESERVE_MS) / 1000
+
+
+async def _dispatch(bulkhead: str, fn, *args):
+    """
+    Run a handler's blocking work on its bulkhead executor.
+
+    Raises:
+        HTTPException: 503 with Retry-After if the bulkhead's queue is full
+    """
+    try:
+        return await run_in_bulkhead(bulkhead, fn, *args)
+    except BulkheadFull:
+        logger.warning(f"Bulkhead {bulkhead} is full; rejecting request")
+        raise HTTPException(status_code=503, detail="Server busy, retry later",
+                            headers={"Retry-After": str(max(1, math.ceil(settings.ADMISSION_RETRY_AFTER_S)))})
+
+
+def _mark_handler_end() -> None:
+    """Let the middleware attribute the remaining time to response serialization"""
+    trace = get_trace()
+    if trace is not None:
+        trace.mark_handler_end()
+
+
+@router.post(
+    "/find-similar",
+    response_model=SimilarResponse,
+    responses={200: {"content": {NEIGHBORS_MEDIA_TYPE: {}},
+                     "description": "JSON, or the columnar binary encoding when requested via Accept"}},
+)
+async def find_similar(req: SimilarRequest, request: Request):
     """
     Find similar apps using embeddings with A/B testing.
 
+    Clients sending `Accept: application/vnd.mobupps.neighbors` get the columnar
+    binary encoding (see app.utils.binary_format) instead of JSON.
+
+    With a deadline (`deadline_ms` or `X-Request-Deadline-Ms`), scoring stops when
+    it runs out and the best neighbors found so far are returned with degraded=true.
+
+    The search runs on the bulkhead executor of the assigned arm.
+
     Raises:
-        HTTPException: 400 for invalid input, 500 for server errors
+        HTTPException: 400 for invalid input, 500 for server errors, 503 if the bulkhead is full
     """
     t0 = perf_counter()
+    # Budgets count from arrival at the middleware, including any admission queue wait
+    trace = get_trace()
+    deadline = _deadline(trace.started_at if trace is not None else t0, req, request)
 
     try:
-        # 1) בחירת זרוע A/B (first, to determine which model to use)
-        arm = _ab.pick_arm(req.partner_id, req.app_id)
+        # 1) בחירת זרוע A/B (first, to determine which model and bulkhead to use)
+        with trace_stage("pick_arm"):
+            experiments = _ab.assign(req.partner_id, req.app_id)
+    except Exception as e:
+        logger.error(f"Unexpected error in find_similar: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error during similarity search")
+
+    arm = experiments[MODEL_LAYER]
+    body = await _dispatch(f"find_similar:{arm}", _find_similar, req, request, t0, deadline, experiments)
+    # The encoding is negotiated on Accept, so shared caches must key on it
+    body.headers["Vary"] = "Accept"
+    return body
 
+
+def _find_similar(req: SimilarRequest, request: Request, t0: float, deadline: float | None, experiments: dict):
+    """find-similar work after arm assignment, up to the encoded Response (runs on a bulkhead thread)"""
+    arm = experiments[MODEL_LAYER]
+
+    try:
         # 2) הפקת embedding לשאילתה (using the selected arm's model)
-        query_vec = _emb_store.vectorize(req.app.dict(), arm)
+        with trace_stage("vectorize"):
+            query_vec = _emb_store.vectorize(req.app.dict(), arm)
 
         if not query_vec or len(query_vec) == 0:
             logger.error(f"Failed to generate embedding for app_id={req.app_id}")
             raise HTTPException(status_code=500, detail="Failed to generate embedding vector")
 
         # Log and record A/B assignment
-        log_ab_assignment(logger, req.partner_id, req.app_id, arm)
+        log_ab_assignment(logger, req.partner_id, req.app_id, arm, experiments=experiments)
         record_ab_assignment("/api/v1/find-similar", arm)
 
         # 3) שליפת שכנים
         k = req.top_k or settings.DEFAULT_TOP_K
+        annotate(arm=arm, top_k=k, filters=req.filters, payload=req)
         if k <= 0 or k > 100:
             raise HTTPException(status_code=400, detail="top_k must be between 1 and 100")
 
-        neighbors = _sim.topk_neighbors(query_vec, k, req.filters, arm)
+        batch = _sim.search(query_vec, k, req.filters, arm, deadline=deadline)
+        if batch.degraded:
+            annotate(degraded=True)
 
         latency_ms = int((perf_counter() - t0) * 1000)
         record_request_latency("/api/v1/find-similar", latency_ms)
-
-        logger.info(f"Found {len(neighbors)} neighbors for app_id={req.app_id}, latency={latency_ms}ms")
-
-        return {"neighbors": [n.dict() for n in neighbors], "ab_arm": arm}
+        record_ab_exposure(arm, req.app_id, req.partner_id, latency_ms, len(batch))
+        record_ab_metrics(arm, latency_ms=latency_ms, similarity=batch.mean_similarity())
+
+        if should_log("find_similar_result"):
+            logger.info(f"Found {len(batch)} neighbors for app_id={req.app_id}, latency={latency_ms}ms")
+
+        with trace_stage("response_build"):
+            if accepts_binary(request.headers.get("accept")):
+                body = Response(encode_neighbors(batch, arm), media_type=NEIGHBORS_MEDIA_TYPE)
+            elif settings.FAST_JSON_RESPONSES:
+                body = FastJSONResponse(body=encode_similar(batch, arm))
+            else:
+                # Validated and encoded here, on the bulkhead thread: a returned Response
+                # skips FastAPI's response_model pass, which would run on the event loop
+                model = SimilarResponse(neighbors=batch.to_neighbors(), ab_arm=arm, degraded=batch.degraded)
+                body = FastJSONResponse(body=model.model_dump_json().encode("utf-8"))
+        _mark_handler_end()
+        return body
 
     except HTTPException:
         raise
     except ValueError as e:
         logger.error(f"Validation error in find_similar: {str(e)}")
+        if arm:
+            record_ab_metrics(arm, error=True)
         raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error in find_similar: {str(e)}", exc_info=True)
+        if arm:
+            record_ab_metrics(arm, error=True)
         raise HTTPException(status_code=500, detail="Internal server error during similarity search")
 
 
 @router.post("/predict", response_model=PredictResponse)
-def predict(req: PredictRequest, request: Request):
+async def predict(req: PredictRequest, request: Request):
     """
     Predict performance based on similar apps using cached performance data.
 
     Raises:
-        HTTPException: 400 for invalid input, 500 for server errors
+        HTTPException: 400 for invalid input, 500 for server errors, 503 if the bulkhead is full
     """
+    return await _dispatch("predict", _predict, req, request)
+
+
+def _predict(req: PredictRequest, request: Request):
+    """predict work, up to the encoded Response (runs on the predict bulkhead thread)"""
     t0 = perf_counter()
 
     try:
-        logger.info(f"Predicting performance for ab_arm={req.ab_arm}")
+        if should_log("predict_request"):
+            logger.info(f"Predicting performance for ab_arm={req.ab_arm}")
 
         if not req.neighbors or len(req.neighbors) == 0:
             raise HTTPException(status_code=400, detail="At least one neighbor is required for prediction")
@@ -87,17 +205,35 @@ def predict(req: PredictRequest, request: Request):
         if req.ab_arm not in ["v1", "v2"]:
             raise HTTPException(status_code=400, detail="ab_arm must be 'v1' or 'v2'")
 
+        annotate(arm=req.ab_arm, top_k=len(req.neighbors), payload=req)
+
         # Use cached performance data from app startup
         cached_data = getattr(request.app.state, 'performance_data_cache', None)
-        predictor = PerformancePredictor(req.ab_arm, performance_data=cached_data)
-        pred = predictor.predict(req.app.dict(), req.neighbors)
+        with trace_stage("predictor_init"):
+            predictor = PerformancePredictor(req.ab_arm, performance_data=cached_data)
+        pred = predictor.predict(req.app.dict(), req.neighbors, ctr_window=req.ctr_window)
         latency_ms = int((perf_counter() - t0) * 1000)
 
         record_request_latency("/api/v1/predict", latency_ms)
-
-        logger.info(f"Prediction complete: score={pred.score}, latency={latency_ms}ms")
-
-        return {"ab_arm": req.ab_arm, "prediction": pred.dict(), "latency_ms": latency_ms}
+        record_ab_outcome(req.ab_arm, req.app_id, req.partner_id, latency_ms, len(req.neighbors), pred.score)
+        record_ab_metrics(req.ab_arm, score=pred.score)
+
+        if should_log("predict_result"):
+            logger.info(f"Prediction complete: score={pred.score}, latency={latency_ms}ms")
+
+        with trace_stage("response_build"):
+            if settings.FAST_JSON_RESPONSES:
+                body = FastJSONResponse({
+                    "ab_arm": req.ab_arm,
+                    "prediction": {"score": pred.score, "segments": pred.segments},
+                    "latency_ms": latency_ms,
+                })
+            else:
+                # Validated and encoded on the bulkhead thread, not by FastAPI on the event loop
+                model = PredictResponse(ab_arm=req.ab_arm, prediction=pred, latency_ms=latency_ms)
+                body = FastJSONResponse(body=model.model_dump_json().encode("utf-8"))
+        _mark_handler_end()
+        return body
 
     except HTTPException:
         raise
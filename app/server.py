@@ -0,0 +1,283 @@
+# Module: server.py
+"""
+Preload-and-fork multi-worker server.
+
+    python -m app.server --workers 4 --port 8000
+
+The master process loads embeddings, metadata and performance data once, runs
+the warm-up queries, freezes the heap (gc.freeze) and binds the listening
+socket, then forks N uvicorn workers. Workers inherit the loaded data as
+copy-on-write pages and accept on the shared socket; their own startup sees
+the data already loaded and skips it.
+
+Supervision:
+  - a worker that exits, or whose heartbeat goes stale, is replaced
+  - SIGHUP: graceful restart (new workers are started, old ones drain and exit)
+  - SIGTERM/SIGINT: graceful shutdown, SIGKILL after the graceful timeout
+
+The data itself is not reloaded on SIGHUP; restart the master to pick up new files.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.utils.logging import get_logger, setup_logging
+
+
+logger = get_logger(__name__)
+
+CRASH_LOOP_WINDOW_S = 5.0  # a worker dying sooner than this delays its replacement
+CRASH_LOOP_BACKOFF_S = 1.0
+
+
+class Worker:
+    """A forked worker process and its heartbeat file"""
+    __slots__ = ("pid", "heartbeat_path", "started_at")
+
+    def __init__(self, pid: int, heartbeat_path: str):
+        self.pid = pid
+        self.heartbeat_path = heartbeat_path
+        self.started_at = time.time()
+
+    def heartbeat_age(self, now: float) -> float:
+        """Seconds since the worker last touched its heartbeat file"""
+        try:
+            return now - os.stat(self.heartbeat_path).st_mtime
+        except OSError:
+            return now - self.started_at
+
+
+async def _heartbeat(path: str, interval_s: float) -> None:
+    """Touch the heartbeat file from the worker's event loop (a blocked loop goes stale)"""
+    while True:
+        os.utime(path, None)
+        await asyncio.sleep(interval_s)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket created in the master and shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    """Forks and supervises uvicorn workers serving a preloaded app"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, worker_timeout_s: float,
+                 heartbeat_interval_s: float, graceful_timeout_s: float):
+        self.app = app
+        self.sock = sock
+        self.num_workers = workers
+        self.worker_timeout_s = worker_timeout_s
+        self.heartbeat_interval_s = heartbeat_interval_s
+        self.graceful_timeout_s = graceful_timeout_s
+        self.workers: Dict[int, Worker] = {}
+        self._retiring: Set[int] = set()  # pids sent SIGTERM during a graceful restart
+        self._signals: List[int] = []
+        self._stopping = False
+        self._next_spawn = 0.0
+        self._heartbeat_dir = tempfile.mkdtemp(prefix="mobupps-workers-")
+
+    # --- worker side ---------------------------------------------------------
+
+    def _run_worker(self, heartbeat_path: str) -> None:
+        # Back to default signal handling; uvicorn installs its own SIGINT/SIGTERM handlers
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        import uvicorn
+
+        async def start_heartbeat():
+            self.app.state.heartbeat_task = asyncio.create_task(
+                _heartbeat(heartbeat_path, self.heartbeat_interval_s)
+            )
+
+        self.app.add_event_handler("startup", start_heartbeat)
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            log_config=None,
+            access_log=False,
+            timeout_graceful_shutdown=int(self.graceful_timeout_s),
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    # --- master side ---------------------------------------------------------
+
+    def spawn(self) -> Worker:
+        fd, heartbeat_path = tempfile.mkstemp(dir=self._heartbeat_dir)
+        os.close(fd)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(heartbeat_path)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} failed: {str(e)}", exc_info=True)
+                code = 1
+            finally:
+                os._exit(code)
+        worker = Worker(pid, heartbeat_path)
+        self.workers[pid] = worker
+        logger.info(f"Started worker {pid}")
+        return worker
+
+    def _on_signal(self, signum, frame) -> None:
+        self._signals.append(signum)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()  # no children left at all
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            try:
+                os.unlink(worker.heartbeat_path)
+            except OSError:
+                pass
+            code = os.waitstatus_to_exitcode(status)
+            if pid in self._retiring or self._stopping:
+                self._retiring.discard(pid)
+                logger.info(f"Worker {pid} exited ({code})")
+                continue
+            logger.warning(f"Worker {pid} died unexpectedly ({code}); replacing it")
+            if time.time() - worker.started_at < CRASH_LOOP_WINDOW_S:
+                self._next_spawn = time.monotonic() + CRASH_LOOP_BACKOFF_S
+
+    def _check_heartbeats(self) -> None:
+        now = time.time()
+        for pid, worker in list(self.workers.items()):
+            if pid in self._retiring:
+                continue
+            age = worker.heartbeat_age(now)
+            if age > self.worker_timeout_s:
+                logger.error(f"Worker {pid} unresponsive for {age:.1f}s; killing it")
+                self._kill(pid, signal.SIGKILL)
+
+    def _kill(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _maintain(self) -> None:
+        active = len(self.workers) - len(self._retiring)
+        while active < self.num_workers and time.monotonic() >= self._next_spawn:
+            self.spawn()
+            active += 1
+
+    def restart_workers(self) -> None:
+        """Graceful restart: start replacements, then let the old workers drain"""
+        old = [pid for pid in self.workers if pid not in self._retiring]
+        logger.info(f"Graceful restart of {len(old)} workers")
+        for _ in old:
+            self.spawn()
+        for pid in old:
+            self._retiring.add(pid)
+            self._kill(pid, signal.SIGTERM)
+
+    def shutdown(self) -> None:
+        """Stop all workers gracefully, force-kill any still running after the timeout"""
+        self._stopping = True
+        for pid in list(self.workers):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout_s
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not stop in time; killing it")
+            self._kill(pid, signal.SIGKILL)
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+        self.sock.close()
+        shutil.rmtree(self._heartbeat_dir, ignore_errors=True)
+        logger.info("Server stopped")
+
+    def run(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self._on_signal)
+        # SIGCHLD only needs to interrupt the sleep below; reaping happens in the loop
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+        self._maintain()
+        while True:
+            self._reap()
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.restart_workers()
+                else:
+                    logger.info(f"Received {signal.Signals(signum).name}; shutting down")
+                    self._stopping = True
+            if self._stopping:
+                break
+            self._check_heartbeats()
+            self._maintain()
+            time.sleep(0.5)
+        self.shutdown()
+
+
+def preload():
+    """Load, warm up and freeze all serving data in this (master) process"""
+    from app.instrumentation.gc_monitor import configure_gc
+    from app.main import app, preload_data, readiness
+    from app.utils.data_loader import ensure_data_files
+
+    ensure_data_files()
+    configure_gc(settings.GC_THRESHOLDS)
+    preload_data()
+    if not readiness.ready:
+        raise SystemExit(f"Preloading data failed: {readiness.error}")
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Preload data once and serve it from forked uvicorn workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--worker-timeout", type=float, default=settings.SERVER_WORKER_TIMEOUT_S)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.SERVER_GRACEFUL_TIMEOUT_S)
+    args = parser.parse_args(argv)
+
+    # Unqueued logging in the master: a log writer thread would not survive fork
+    setup_logging(level=settings.LOG_LEVEL, structured=settings.LOG_STRUCTURED)
+
+    start = time.perf_counter()
+    app = preload()
+    logger.info(f"Preloaded serving data in {time.perf_counter() - start:.1f}s; forking {args.workers} workers")
+
+    master = Master(
+        app,
+        bind_socket(args.host, args.port),
+        workers=args.workers,
+        worker_timeout_s=args.worker_timeout,
+        heartbeat_interval_s=settings.SERVER_HEARTBEAT_INTERVAL_S,
+        graceful_timeout_s=args.graceful_timeout,
+    )
+    master.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,74 @@
+# Module: ab_test.py
 import hashlib
 from dataclasses import dataclass
+from random import random
+from typing import Dict
+
+from app.services.experiments import ExperimentEngine
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+MODEL_LAYER = "model"
 
 
 @dataclass
 class ABPolicy:
     v1_weight: float = 0.5  # 0..1
     sticky: bool = True
+    # Model arm from the pre-engine MD5 threshold, so sticky users keep their arm across the upgrade
+    legacy_md5: bool = False
 
 
 class ABTestController:
-    def __init__(self, policy: ABPolicy | None = None):
+    def __init__(self, policy: ABPolicy | None = None, engine: ExperimentEngine | None = None):
         self.policy = policy or ABPolicy()
+        self.engine = engine or ExperimentEngine()
+        # Model arms pick the embeddings index and bulkhead, so only v1/v2 are valid
+        self.engine.restrict_arms(MODEL_LAYER, {"v1", "v2"})
+        if self.policy.legacy_md5:
+            # Assigned by _legacy_arm; reloads of the layer only move the v1 threshold
+            self.engine.delegate_layer(MODEL_LAYER, self._apply_legacy_weights)
+        self.engine.configure({MODEL_LAYER: self._model_weights(self.policy.v1_weight)})
+
+    @staticmethod
+    def _model_weights(v1_weight: float) -> Dict[str, float]:
+        return {"v1": v1_weight, "v2": 1.0 - v1_weight}
 
-    def _hash_to_unit(self, key: str) -> float:
-        h = hashlib.md5(key.encode()).hexdigest()
-        return int(h, 16) / float(16**32)
+    @staticmethod
+    def _unit_key(partner_id: str | None, app_id: str | None) -> str:
+        return f"{partner_id or ''}:{app_id or ''}"
+
+    @staticmethod
+    def _legacy_arm(key: str, v1_weight: float) -> str:
+        """Model arm as assigned before the experiment engine (MD5 of the unit key vs. the v1 weight)"""
+        u = int(hashlib.md5(key.encode()).hexdigest(), 16) / float(16**32)
+        return "v1" if u < v1_weight else "v2"
+
+    def _apply_legacy_weights(self, weights: Dict[str, float]) -> None:
+        self.policy.v1_weight = weights.get("v1", 0.0) / sum(weights.values())
+        logger.info(f"Model layer split set to v1_weight={self.policy.v1_weight:.3f}")
+
+    def set_v1_weight(self, v1_weight: float) -> None:
+        """Hot-reload the model split; only the buckets that must move change arm"""
+        self.policy.v1_weight = v1_weight
+        self.engine.configure({MODEL_LAYER: self._model_weights(v1_weight)})
 
     def pick_arm(self, partner_id: str | None, app_id: str | None) -> str:
         if not self.policy.sticky:
-            from random import random
             return "v1" if random() < self.policy.v1_weight else "v2"
-        key = f"{partner_id or ''}:{app_id or ''}"
-        u = self._hash_to_unit(key)
-        return "v1" if u < self.policy.v1_weight else "v2"
\ No newline at end of file
+        key = self._unit_key(partner_id, app_id)
+        if self.policy.legacy_md5:
+            return self._legacy_arm(key, self.policy.v1_weight)
+        return self.engine.assign_layer(key, MODEL_LAYER)
+
+    def assign(self, partner_id: str | None, app_id: str | None) -> Dict[str, str]:
+        """Arms for every active experiment layer (model arm under MODEL_LAYER)"""
+        key = self._unit_key(partner_id, app_id)
+        assignments = self.engine.assign(key)  # no model layer in the engine in legacy mode
+        if not self.policy.sticky:
+            assignments[MODEL_LAYER] = "v1" if random() < self.policy.v1_weight else "v2"
+        elif self.policy.legacy_md5:
+            assignments[MODEL_LAYER] = self._legacy_arm(key, self.policy.v1_weight)
+        return assignments
@@ -0,0 +1,99 @@
+import math
+import os
+import pickle
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+MISSING = -1  # row/code for an absent app or a null category
+
+
+def _clean(value: Any) -> Optional[Any]:
+    """pandas NaN (and None) -> None"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+class AppMetadataStore:
+    """
+    App metadata as columns: one row per app, names pre-cleaned and categories
+    dictionary-encoded. Callers align their own row order (e.g. an embedding
+    index) once with `align` and then join by gathering rows.
+    """
+
+    def __init__(self, records: Optional[Dict[str, dict]] = None):
+        self.row_of: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self.categories: List[str] = []  # code -> category
+        self.category_codes = array("i")  # row -> code, MISSING for null
+        category_index: Dict[str, int] = {}
+
+        for app_id, metadata in (records or {}).items():
+            metadata = metadata or {}
+            self.row_of[app_id] = len(self.names)
+            self.names.append(_clean(metadata.get("name")))
+            category = _clean(metadata.get("category"))
+            if category is None:
+                self.category_codes.append(MISSING)
+            else:
+                code = category_index.get(category)
+                if code is None:
+                    code = category_index[category] = len(self.categories)
+                    self.categories.append(category)
+                self.category_codes.append(code)
+
+    @classmethod
+    def load(cls, path: str) -> "AppMetadataStore":
+        """
+        Load a pickled {app_id: {"name", "category", ...}} mapping.
+
+        Raises:
+            pickle.UnpicklingError: If metadata file is corrupted
+        """
+        if not os.path.exists(path):
+            logger.warning(f"Metadata file not found: {path}")
+            return cls()
+        try:
+            with open(path, "rb") as f:
+                records = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError) as e:
+            logger.error(f"Failed to unpickle metadata file: {str(e)}")
+            raise
+        store = cls(records)
+        logger.info(f"Loaded metadata for {len(store)} apps ({len(store.categories)} categories)")
+        return store
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def align(self, app_ids: Sequence[str]) -> array:
+        """Metadata row for each app id (MISSING if unknown), in the given order"""
+        row_of = self.row_of
+        return array("i", (row_of.get(app_id, MISSING) for app_id in app_ids))
+
+    def gather(self, rows: Sequence[int]) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """(names, categories) for the given rows"""
+        names, codes, categories = self.names, self.category_codes, self.categories
+        out_names: List[Optional[str]] = []
+        out_categories: List[Optional[str]] = []
+        for row in rows:
+            if row == MISSING:
+                out_names.append(None)
+                out_categories.append(None)
+                continue
+            out_names.append(names[row])
+            code = codes[row]
+            out_categories.append(None if code == MISSING else categories[code])
+        return out_names, out_categories
+
+    def category_code(self, category: str) -> int:
+        """Dictionary code of a category (MISSING if unknown), for filters/facets over category_codes"""
+        try:
+            return self.categories.index(category)
+        except ValueError:
+            return MISSING
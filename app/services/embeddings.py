@@ -25,6 +25,14 @@ class EmbeddingsStore:
             self._v2 = pickle.load(f)
         return self._v2
 
+    def loaded_sizes(self) -> dict:
+        """Number of embeddings per arm, for arms already loaded"""
+        return {
+            arm: len(index)
+            for arm, index in (("v1", self._v1), ("v2", self._v2))
+            if index is not None
+        }
+
     def get_by_arm(self, arm: Arm):
         return self.load_v1() if arm == "v1" else self.load_v2()
 
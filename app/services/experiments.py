@@ -0,0 +1,202 @@
+# Module: experiments.py
+"""
+Layered experiment engine with precomputed bucket tables.
+
+A unit key (partner_id:app_id) is hashed once into a 64-bit value; each layer
+derives its own bucket from that value with a cheap integer mix, so adding a
+layer never adds another digest per request. Arms are resolved with a single
+table lookup per layer.
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+NUM_BUCKETS = 10_000
+_MASK64 = (1 << 64) - 1
+
+
+def hash_key(key: str) -> int:
+    """64-bit digest of a unit key"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _mix64(value: int) -> int:
+    """SplitMix64 finalizer: decorrelates buckets across layers for the same key"""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _bucket_counts(weights: Dict[str, float]) -> Dict[str, int]:
+    """Split NUM_BUCKETS across arms proportionally (largest remainder)"""
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Experiment weights must sum to a positive value")
+    exact = {arm: NUM_BUCKETS * w / total for arm, w in weights.items()}
+    counts = {arm: int(v) for arm, v in exact.items()}
+    leftover = NUM_BUCKETS - sum(counts.values())
+    for arm in sorted(exact, key=lambda a: exact[a] - counts[a], reverse=True)[:leftover]:
+        counts[arm] += 1
+    return counts
+
+
+class Experiment:
+    """One layer: a bucket -> arm table over NUM_BUCKETS buckets"""
+
+    def __init__(self, name: str, weights: Dict[str, float]):
+        for arm, weight in weights.items():
+            if weight < 0:
+                raise ValueError(f"Weight for arm {arm!r} in layer {name!r} must be non-negative")
+        self.name = name
+        self.salt = hash_key(f"layer:{name}")
+        self.weights = dict(weights)
+
+        arms = list(weights)
+        table = bytearray(NUM_BUCKETS)
+        pos = 0
+        for idx, count in enumerate(_bucket_counts(weights).values()):
+            table[pos:pos + count] = bytes([idx]) * count
+            pos += count
+        # (arms, table) is swapped as one tuple so readers never see a mismatch
+        self._state: Tuple[List[str], bytearray] = (arms, table)
+
+    def bucket(self, key_hash: int) -> int:
+        return _mix64(key_hash ^ self.salt) % NUM_BUCKETS
+
+    def arm_for(self, key_hash: int) -> str:
+        arms, table = self._state
+        return arms[table[self.bucket(key_hash)]]
+
+    def reweight(self, weights: Dict[str, float]) -> int:
+        """
+        Apply new weights, moving as few buckets as possible.
+
+        Buckets keep their arm unless that arm shrank or was removed, so sticky
+        assignments of everyone else survive a reload.
+
+        Returns:
+            Number of buckets that changed arm
+        """
+        for arm, weight in weights.items():
+            if weight < 0:
+                raise ValueError(f"Weight for arm {arm!r} in layer {self.name!r} must be non-negative")
+        arms, table = self._state
+        new_arms = arms + [arm for arm in weights if arm not in arms]
+        targets = _bucket_counts(weights)
+        new_table = bytearray(table)
+
+        owned: Dict[int, List[int]] = {idx: [] for idx in range(len(new_arms))}
+        for bucket, idx in enumerate(table):
+            owned[idx].append(bucket)
+
+        # Release surplus buckets from the tail of each shrinking arm
+        free: List[int] = []
+        for idx, arm in enumerate(new_arms):
+            surplus = len(owned[idx]) - targets.get(arm, 0)
+            if surplus > 0:
+                free.extend(owned[idx][-surplus:])
+        free.sort()
+
+        # Hand them to the arms that grew
+        pos = 0
+        for idx, arm in enumerate(new_arms):
+            deficit = targets.get(arm, 0) - len(owned[idx])
+            for bucket in free[pos:pos + deficit]:
+                new_table[bucket] = idx
+            pos += max(deficit, 0)
+
+        self.weights = dict(weights)
+        self._state = (new_arms, new_table)
+        return len(free)
+
+
+class ExperimentEngine:
+    """Concurrent layered experiments resolved from one hash per request"""
+
+    def __init__(self):
+        self._layers: Dict[str, Experiment] = {}
+        self._config_mtime: Optional[float] = None
+        self._allowed_arms: Dict[str, Set[str]] = {}  # layer -> the only arm names it accepts
+        self._delegated: Dict[str, Callable[[Dict[str, float]], None]] = {}  # layers assigned elsewhere
+
+    @property
+    def layers(self) -> Dict[str, Experiment]:
+        return self._layers
+
+    def restrict_arms(self, name: str, arms: Set[str]) -> None:
+        """Reject configs that give layer `name` arms outside `arms`"""
+        self._allowed_arms[name] = set(arms)
+
+    def delegate_layer(self, name: str, apply: Callable[[Dict[str, float]], None]) -> None:
+        """Hand weights for layer `name` to `apply` instead of bucketing it in the engine"""
+        self._delegated[name] = apply
+        self.remove(name)
+
+    def configure(self, config: Dict[str, Dict[str, float]]) -> None:
+        """
+        Set weights for several layers; existing layers are reweighted in place
+        (sticky), new layers are created, layers missing from config are kept.
+
+        Raises:
+            ValueError: If a layer has invalid weights or names arms it is restricted
+                from (nothing is applied)
+        """
+        for name, weights in config.items():
+            allowed = self._allowed_arms.get(name)
+            if allowed is not None and not set(weights) <= allowed:
+                raise ValueError(f"Layer {name!r} only accepts arms {sorted(allowed)}, got {sorted(weights)}")
+            if any(weight < 0 for weight in weights.values()):
+                raise ValueError(f"Weights for layer {name!r} must be non-negative")
+            if sum(weights.values()) <= 0:
+                raise ValueError(f"Weights for layer {name!r} must sum to a positive value")
+
+        layers = dict(self._layers)
+        for name, weights in config.items():
+            if name in self._delegated:
+                self._delegated[name](weights)
+            elif name in layers:
+                moved = layers[name].reweight(weights)
+                logger.info(f"Reweighted experiment layer {name}: {moved} buckets moved")
+            else:
+                layers[name] = Experiment(name, weights)
+        self._layers = layers
+
+    def remove(self, name: str) -> None:
+        layers = dict(self._layers)
+        layers.pop(name, None)
+        self._layers = layers
+
+    def assign(self, key: str) -> Dict[str, str]:
+        """Arm for every layer, hashing the key once"""
+        key_hash = hash_key(key)
+        return {name: layer.arm_for(key_hash) for name, layer in self._layers.items()}
+
+    def assign_layer(self, key: str, name: str) -> str:
+        return self._layers[name].arm_for(hash_key(key))
+
+    def reload_if_changed(self, path: str) -> bool:
+        """
+        Hot-reload layer weights from a JSON file ({"layer": {"arm": weight}})
+        when its mtime changed.
+
+        Returns:
+            True if the file was (re)applied
+        """
+        if not path or not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if mtime == self._config_mtime:
+            return False
+        with open(path) as f:
+            config = json.load(f)
+        # Recorded before applying: an invalid file is reported once, not on every poll
+        self._config_mtime = mtime
+        self.configure(config)
+        logger.info(f"Loaded experiment config from {path} ({len(config)} layers)")
+        return True
@@ -0,0 +1,280 @@
+# Module: performance_data.py
+"""
+Incremental aggregation of historical performance data.
+
+The base CSV (HIST_PERF_PATH) is read once at startup. Dated daily partitions
+dropped into HIST_PERF_PARTITIONS_DIR are folded into the running per-app
+totals as they appear, so refreshing never re-reads history.
+
+When the data has a date column, per-app daily click/impression totals are kept
+as well and rolling-window (7/30/90-day) and exponentially decayed CTRs are
+precomputed into every snapshot, so predictions can pick a window for free.
+
+pandas is imported only when files are folded, so importing this module (e.g.
+for ctr_key on the request path) stays cheap.
+"""
+from datetime import date
+from pathlib import Path
+from threading import Lock
+import time
+from typing import Dict, List, Optional
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+REQUIRED_COLUMNS = ['app_id', 'clicks', 'impressions']
+REVENUE_COLUMN = 'mmp_offer_default_revenue'
+CTR_WINDOW_DAYS = (7, 30, 90)
+CTR_WINDOWS = ("lifetime",) + tuple(f"{days}d" for days in CTR_WINDOW_DAYS) + ("decayed",)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def ctr_key(window: str) -> str:
+    """Snapshot key holding the CTR for a window name ('lifetime', '7d', ..., 'decayed')"""
+    return 'ctr' if window == "lifetime" else f'ctr_{window}'
+
+
+class PerformanceAggregator:
+    """
+    Running per-app performance totals built from a base CSV plus daily partitions.
+
+    Every load/refresh produces a brand-new snapshot dict; entries of untouched
+    apps are shared with the previous snapshot, so callers can swap the result
+    into `app.state.performance_data_cache` in a single assignment.
+    """
+
+    def __init__(self, base_path: str, partitions_dir: str = "",
+                 date_column: str = "date", decay_half_life_days: float = 14.0,
+                 partition_settle_s: float = 10.0):
+        self.base_path = base_path
+        self.partitions_dir = partitions_dir
+        self.date_column = date_column
+        self.decay_half_life_days = decay_half_life_days
+        # A partition is only read once unmodified this long (it may still be being written)
+        self.partition_settle_s = partition_settle_s
+        self._lock = Lock()
+
+        # app_id -> running sums (revenue mean is kept as sum + count)
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._seen_partitions: set[str] = set()
+        self._snapshot: Dict[str, Dict] = {}
+
+        # app_id -> {day ordinal: [clicks, impressions]}, only for dated data
+        self._daily: Dict[str, Dict[int, List[float]]] = {}
+        self._reference_day: Optional[int] = None
+        self._snapshot_reference_day: Optional[int] = None
+
+    @property
+    def snapshot(self) -> Dict[str, Dict]:
+        """Latest aggregated snapshot (app_id -> metrics)"""
+        return self._snapshot
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Load the base CSV and every partition currently on disk.
+
+        Returns:
+            Dict mapping app_id to performance metrics
+        """
+        with self._lock:
+            self._totals = {}
+            self._seen_partitions = set()
+            self._daily = {}
+            self._reference_day = None
+            self._snapshot_reference_day = None
+
+            touched = set()
+            if Path(self.base_path).exists():
+                logger.info(f"Loading performance data from {self.base_path}...")
+                touched |= self._fold_file(self.base_path) or set()
+            else:
+                logger.warning(f"Performance data file not found: {self.base_path}")
+
+            for partition in self._pending_partitions():
+                folded = self._fold_file(partition)
+                if folded is not None:
+                    touched |= folded
+                    self._seen_partitions.add(partition)
+
+            self._snapshot = self._build_snapshot({}, touched)
+            logger.info(f"Cached performance data for {len(self._snapshot)} apps")
+            return self._snapshot
+
+    def refresh(self) -> Optional[Dict[str, Dict]]:
+        """
+        Fold partitions that appeared since the last load/refresh.
+
+        Partitions that fail to read are not marked as folded, so the next
+        refresh retries them.
+
+        Returns:
+            New snapshot dict, or None if no new partitions were folded
+        """
+        with self._lock:
+            touched = set()
+            folded_count = 0
+            for partition in self._pending_partitions():
+                folded = self._fold_file(partition)
+                if folded is None:
+                    continue
+                touched |= folded
+                folded_count += 1
+                self._seen_partitions.add(partition)
+            if not folded_count:
+                return None
+
+            self._snapshot = self._build_snapshot(self._snapshot, touched)
+            logger.info(
+                f"Folded {folded_count} new performance partition(s), "
+                f"{len(touched)} apps updated"
+            )
+            return self._snapshot
+
+    def _pending_partitions(self) -> List[str]:
+        """Settled partition files not folded yet, in name (date) order"""
+        if not self.partitions_dir:
+            return []
+        directory = Path(self.partitions_dir)
+        if not directory.is_dir():
+            return []
+        settled_before = time.time() - self.partition_settle_s
+        pending = []
+        for p in directory.glob("*.csv"):
+            if str(p) in self._seen_partitions:
+                continue
+            try:
+                if p.stat().st_mtime > settled_before:
+                    continue  # still being written; picked up by a later refresh
+            except OSError:
+                continue
+            pending.append(str(p))
+        return sorted(pending)
+
+    def _fold_file(self, path: str) -> Optional[set]:
+        """
+        Aggregate one CSV file and add it to the running totals.
+
+        Returns:
+            Set of app_ids touched by this file, or None if it could not be read
+            (the running totals are left unchanged)
+        """
+        import pandas as pd
+
+        try:
+            df = pd.read_csv(path)
+        except Exception as e:
+            logger.error(f"Error loading performance data from {path}: {str(e)}")
+            return None
+
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_cols:
+            logger.error(f"Missing required columns in {path}: {missing_cols}")
+            return None
+
+        if 'event_count' not in df.columns:
+            # Without an explicit event count every row counts as one event
+            df['event_count'] = 1
+        if REVENUE_COLUMN not in df.columns:
+            df[REVENUE_COLUMN] = float('nan')
+
+        agg = df.groupby('app_id').agg(
+            clicks=('clicks', 'sum'),
+            impressions=('impressions', 'sum'),
+            event_count=('event_count', 'sum'),
+            revenue_sum=(REVENUE_COLUMN, 'sum'),
+            revenue_n=(REVENUE_COLUMN, 'count'),
+        )
+
+        for app_id, row in agg.iterrows():
+            totals = self._totals.setdefault(app_id, {
+                'clicks': 0.0, 'impressions': 0.0, 'event_count': 0.0,
+                'revenue_sum': 0.0, 'revenue_n': 0,
+            })
+            totals['clicks'] += row['clicks']
+            totals['impressions'] += row['impressions']
+            totals['event_count'] += row['event_count']
+            totals['revenue_sum'] += row['revenue_sum']
+            totals['revenue_n'] += int(row['revenue_n'])
+
+        if self.date_column in df.columns:
+            self._fold_daily(df)
+
+        return set(agg.index)
+
+    def _fold_daily(self, df) -> None:
+        """Add per-app daily click/impression totals used for windowed CTRs"""
+        import pandas as pd
+
+        dates = pd.to_datetime(df[self.date_column], errors='coerce')
+        if isinstance(dates.dtype, pd.DatetimeTZDtype):
+            dates = dates.dt.tz_localize(None)  # local calendar day, as date.toordinal() would give
+        # Day ordinals (date.toordinal()) computed column-wise; NaT becomes NaN and is dropped
+        days = (dates - pd.Timestamp(0)) // pd.Timedelta(days=1) + EPOCH_ORDINAL
+        dated = df.assign(_day=days).dropna(subset=['_day'])
+        if dated.empty:
+            return
+
+        daily = dated.groupby(['app_id', '_day'])[['clicks', 'impressions']].sum()
+        for (app_id, day), row in daily.iterrows():
+            day = int(day)
+            bucket = self._daily.setdefault(app_id, {}).setdefault(day, [0.0, 0.0])
+            bucket[0] += row['clicks']
+            bucket[1] += row['impressions']
+            if self._reference_day is None or day > self._reference_day:
+                self._reference_day = day
+
+    def _build_snapshot(self, previous: Dict[str, Dict], touched: set) -> Dict[str, Dict]:
+        """Copy the previous snapshot and recompute metrics for touched apps only"""
+        snapshot = dict(previous)
+        if self._reference_day != self._snapshot_reference_day:
+            # Windows are relative to the newest day, so every dated app shifts
+            touched = touched | set(self._daily)
+            self._snapshot_reference_day = self._reference_day
+
+        for app_id in touched:
+            totals = self._totals[app_id]
+            revenue_n = totals['revenue_n']
+            snapshot[app_id] = {
+                'clicks': totals['clicks'],
+                'impressions': totals['impressions'],
+                'event_count': totals['event_count'],
+                REVENUE_COLUMN: totals['revenue_sum'] / revenue_n if revenue_n else float('nan'),
+                # CTR (Click-Through Rate) as performance score
+                'ctr': totals['clicks'] / (totals['impressions'] + 1),
+            }
+            if app_id in self._daily:
+                snapshot[app_id].update(self._windowed_ctrs(self._daily[app_id]))
+        return snapshot
+
+    def _windowed_ctrs(self, days: Dict[int, List[float]]) -> Dict[str, float]:
+        """
+        Rolling-window and exponentially decayed CTRs from daily totals.
+
+        Windows without impressions are left out, so readers fall back to the
+        lifetime CTR instead of treating the app as a zero-CTR performer.
+        """
+        ref = self._reference_day
+        window_sums = {window: [0.0, 0.0] for window in CTR_WINDOW_DAYS}
+        decayed_clicks = decayed_impressions = 0.0
+
+        for day, (clicks, impressions) in days.items():
+            age = ref - day
+            for window, sums in window_sums.items():
+                if age < window:
+                    sums[0] += clicks
+                    sums[1] += impressions
+            weight = 0.5 ** (age / self.decay_half_life_days)
+            decayed_clicks += clicks * weight
+            decayed_impressions += impressions * weight
+
+        ctrs = {
+            ctr_key(f"{window}d"): clicks / (impressions + 1)
+            for window, (clicks, impressions) in window_sums.items()
+            if impressions > 0
+        }
+        if decayed_impressions > 0:
+            # Plain ratio: a +1 after weighting would outweigh the decayed totals of quiet apps
+            ctrs[ctr_key("decayed")] = decayed_clicks / decayed_impressions
+        return ctrs
@@ -1,7 +1,8 @@
 from typing import List
 from app.models.schemas import Neighbor, Prediction
+from app.services.performance_data import ctr_key
 from app.utils.logging import get_logger
-import pandas as pd
+from app.instrumentation.tracing import trace_stage
 import os
 
 
@@ -43,6 +44,9 @@ class PerformancePredictor:
             FileNotFoundError: If performance data file doesn't exist
             pd.errors.ParserError: If CSV is malformed
         """
+        # Offline fallback only; the serving path uses the cached aggregate
+        import pandas as pd
+
         perf_path = 'data/historical_performance.csv'
         if os.path.exists(perf_path):
             try:
@@ -79,13 +83,16 @@ class PerformancePredictor:
             logger.warning(f"Performance data file not found: {perf_path}")
             return {}
 
-    def predict(self, app: dict, neighbors: List[Neighbor]) -> Prediction:
+    def predict(self, app: dict, neighbors: List[Neighbor], ctr_window: str = "lifetime") -> Prediction:
         """
         Predict performance based on similar historical apps' actual metrics.
 
         Args:
             app: App metadata dict
             neighbors: List of similar apps with similarity scores
+            ctr_window: Precomputed CTR aggregate to use ('lifetime', '7d', '30d',
+                '90d' or 'decayed'); falls back to lifetime CTR when the data
+                has no dates or the app had no impressions in the window
 
         Returns:
             Prediction with score and segments
@@ -100,41 +107,45 @@ class PerformancePredictor:
             raise ValueError(f"app must be a dict, got {type(app)}")
 
         try:
+            window_key = ctr_key(ctr_window)
+
             # Get performance scores for neighbors that have data
             weighted_scores = []
             total_similarity = 0.0
 
-            for n in neighbors[:5]:  # Top 5 neighbors
-                try:
-                    if n.app_id in self._performance_data:
-                        perf = self._performance_data[n.app_id]
-                        ctr = perf.get('ctr', 0)
-
-                        # Validate CTR value
-                        if not isinstance(ctr, (int, float)) or ctr < 0:
-                            logger.warning(f"Invalid CTR value for app {n.app_id}: {ctr}")
-                            continue
-
-                        # Weight by similarity
-                        weighted_scores.append(ctr * n.similarity)
-                        total_similarity += n.similarity
-                except Exception as e:
-                    logger.warning(f"Error processing neighbor {n.app_id}: {str(e)}")
-                    continue
-
-            if weighted_scores and total_similarity > 0:
-                # Average of weighted historical performance
-                score = sum(weighted_scores) / max(total_similarity, 0.1)
-                # Normalize to 0-1 range (CTR is typically small)
-                score = min(0.95, max(0.05, score * 1000))  # Scale up CTR
-                logger.debug(f"Calculated score from {len(weighted_scores)} neighbors: {score}")
-            else:
-                # Fallback if no performance data available
-                fallback_sim = sum(n.similarity for n in neighbors[:min(5, len(neighbors))])
-                score = 0.5 + (fallback_sim / min(5, len(neighbors))) * 0.4
-                logger.info(f"Using fallback score calculation: {score}")
-
-            segments = self._infer_segments(app, neighbors)
+            with trace_stage("neighbor_scoring"):
+                for n in neighbors[:5]:  # Top 5 neighbors
+                    try:
+                        if n.app_id in self._performance_data:
+                            perf = self._performance_data[n.app_id]
+                            ctr = perf.get(window_key, perf.get('ctr', 0))
+
+                            # Validate CTR value
+                            if not isinstance(ctr, (int, float)) or ctr < 0:
+                                logger.warning(f"Invalid CTR value for app {n.app_id}: {ctr}")
+                                continue
+
+                            # Weight by similarity
+                            weighted_scores.append(ctr * n.similarity)
+                            total_similarity += n.similarity
+                    except Exception as e:
+                        logger.warning(f"Error processing neighbor {n.app_id}: {str(e)}")
+                        continue
+
+                if weighted_scores and total_similarity > 0:
+                    # Average of weighted historical performance
+                    score = sum(weighted_scores) / max(total_similarity, 0.1)
+                    # Normalize to 0-1 range (CTR is typically small)
+                    score = min(0.95, max(0.05, score * 1000))  # Scale up CTR
+                    logger.debug(f"Calculated score from {len(weighted_scores)} neighbors: {score}")
+                else:
+                    # Fallback if no performance data available
+                    fallback_sim = sum(n.similarity for n in neighbors[:min(5, len(neighbors))])
+                    score = 0.5 + (fallback_sim / min(5, len(neighbors))) * 0.4
+                    logger.info(f"Using fallback score calculation: {score}")
+
+            with trace_stage("segments"):
+                segments = self._infer_segments(app, neighbors)
             return Prediction(score=float(round(score, 3)), segments=segments)
 
         except Exception as e:
@@ -1,46 +1,60 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from app.models.schemas import Neighbor
+from app.models.neighbors import NeighborBatch
+from app.services.app_metadata import AppMetadataStore
 from app.utils.logging import get_logger
-import pickle
-import os
+from app.instrumentation.tracing import trace_stage
+from time import perf_counter
 
 
 logger = get_logger(__name__)
 
+# Rows scored between deadline checks
+DEADLINE_CHECK_ROWS = 256
+
 
 class SimilarityService:
-    def __init__(self, embeddings_store):
+    def __init__(self, embeddings_store, metadata_path: str = "data/app_metadata.pkl"):
         self.embeddings_store = embeddings_store
-        try:
-            self._app_metadata = self._load_metadata()
-        except Exception as e:
-            logger.error(f"Failed to load metadata: {str(e)}")
-            self._app_metadata = {}
+        self.metadata_path = metadata_path
+        # arm -> (index, app ids in index order, metadata row per index row)
+        self._aligned: Dict[str, Tuple[Any, List[str], Any]] = {}
+        self._app_metadata: AppMetadataStore | None = None
+
+    def ensure_metadata(self) -> AppMetadataStore:
+        """Load app metadata on first use (or eagerly at startup); idempotent"""
+        if self._app_metadata is None:
+            try:
+                self._app_metadata = self._load_metadata()
+            except Exception as e:
+                logger.error(f"Failed to load metadata: {str(e)}")
+                self._app_metadata = AppMetadataStore()
+        return self._app_metadata
+
+    def metadata_size(self) -> int:
+        """Apps in the metadata store, 0 until it is loaded"""
+        return len(self._app_metadata) if self._app_metadata is not None else 0
 
-    def _load_metadata(self):
+    def _load_metadata(self) -> AppMetadataStore:
         """
-        Load app metadata mapping.
+        Load app metadata into a columnar store.
 
         Returns:
-            Dict mapping app_id to metadata
+            AppMetadataStore (empty if the file doesn't exist)
 
         Raises:
-            FileNotFoundError: If metadata file doesn't exist
             pickle.UnpicklingError: If metadata file is corrupted
         """
-        metadata_path = 'data/app_metadata.pkl'
-        if os.path.exists(metadata_path):
-            try:
-                with open(metadata_path, 'rb') as f:
-                    metadata = pickle.load(f)
-                logger.info(f"Loaded metadata for {len(metadata)} apps")
-                return metadata
-            except (pickle.UnpicklingError, EOFError) as e:
-                logger.error(f"Failed to unpickle metadata file: {str(e)}")
-                raise
-        else:
-            logger.warning(f"Metadata file not found: {metadata_path}")
-            return {}
+        return AppMetadataStore.load(self.metadata_path)
+
+    def _aligned_rows(self, arm: str, index) -> Tuple[List[str], Any]:
+        """App ids and metadata rows aligned to the index's row order (computed once per loaded index)"""
+        cached = self._aligned.get(arm)
+        if cached is None or cached[0] is not index:
+            ids = list(index.keys())
+            cached = (index, ids, self.ensure_metadata().align(ids))
+            self._aligned[arm] = cached
+        return cached[1], cached[2]
 
     def topk_neighbors(self, query_vec: list[float], k: int, filters: Dict[str, List[str]] | None, arm: str) -> List[Neighbor]:
         """
@@ -55,6 +69,31 @@ class SimilarityService:
         Returns:
             List of Neighbor objects sorted by similarity
 
+        Raises:
+            ValueError: If inputs are invalid
+            RuntimeError: If embeddings cannot be loaded
+        """
+        batch = self.search(query_vec, k, filters, arm)
+        with trace_stage("build_neighbors"):
+            return batch.to_neighbors()
+
+    def search(self, query_vec: list[float], k: int, filters: Dict[str, List[str]] | None, arm: str,
+               deadline: float | None = None) -> NeighborBatch:
+        """
+        Find top-k most similar apps as result columns (no per-neighbor models).
+
+        Args:
+            query_vec: Query embedding vector
+            k: Number of neighbors to return
+            filters: Optional filters for category/region
+            arm: A/B test arm ('v1' or 'v2')
+            deadline: Optional perf_counter() time by which scoring must stop; the
+                top-k of the rows scored so far (at least the first DEADLINE_CHECK_ROWS)
+                is returned with degraded=True
+
+        Returns:
+            NeighborBatch sorted by similarity
+
         Raises:
             ValueError: If inputs are invalid
             RuntimeError: If embeddings cannot be loaded
@@ -69,7 +108,8 @@ class SimilarityService:
             raise ValueError(f"arm must be 'v1' or 'v2', got {arm}")
         try:
             # Load embeddings for the specified arm (v1 or v2)
-            index = self.embeddings_store.get_by_arm(arm)
+            with trace_stage("index_load"):
+                index = self.embeddings_store.get_by_arm(arm)
             if not index:
                 raise RuntimeError(f"No embeddings loaded for arm {arm}")
         except Exception as e:
@@ -97,90 +137,88 @@ class SimilarityService:
         items = []
         skipped_count = 0
 
-        for app_id, embedding_array in index.items():
-            try:
-                vec = None
-
-                # If the embedding is a numpy array, average it to get a single vector
-                if isinstance(embedding_array, np.ndarray):
-                    if len(embedding_array.shape) > 1:
-                        # Multi-dimensional array: average across rows
-                        vec = embedding_array.mean(axis=0).tolist()
+        degraded = False
+
+        with trace_stage("scoring"):
+            for row, (app_id, embedding_array) in enumerate(index.items()):
+                # Deadline checked every DEADLINE_CHECK_ROWS rows to keep the loop cheap; the
+                # first chunk is always scored so a degraded result is never empty
+                if deadline is not None and row and row % DEADLINE_CHECK_ROWS == 0 and perf_counter() >= deadline:
+                    degraded = True
+                    logger.debug(f"Deadline reached after scoring {row}/{len(index)} rows")
+                    break
+                try:
+                    vec = None
+
+                    # If the embedding is a numpy array, average it to get a single vector
+                    if isinstance(embedding_array, np.ndarray):
+                        if len(embedding_array.shape) > 1:
+                            # Multi-dimensional array: average across rows
+                            vec = embedding_array.mean(axis=0).tolist()
+                        else:
+                            vec = embedding_array.tolist()
+                    elif isinstance(embedding_array, dict):
+                        # Try to extract vec from dict
+                        vec = embedding_array.get("vec")
+                        if vec is None:
+                            # If no "vec" key, skip this entry
+                            skipped_count += 1
+                            continue
+                    elif isinstance(embedding_array, (list, tuple)):
+                        vec = list(embedding_array)
                     else:
-                        vec = embedding_array.tolist()
-                elif isinstance(embedding_array, dict):
-                    # Try to extract vec from dict
-                    vec = embedding_array.get("vec")
-                    if vec is None:
-                        # If no "vec" key, skip this entry
+                        # Unknown format, skip
                         skipped_count += 1
                         continue
-                elif isinstance(embedding_array, (list, tuple)):
-                    vec = list(embedding_array)
-                else:
-                    # Unknown format, skip
-                    skipped_count += 1
-                    continue
 
-                # Safety check
-                if vec is None or not isinstance(vec, (list, tuple)):
-                    skipped_count += 1
-                    continue
+                    # Safety check
+                    if vec is None or not isinstance(vec, (list, tuple)):
+                        skipped_count += 1
+                        continue
 
-                # Pad or truncate vector to match query length
-                if len(vec) != len(query_vec):
-                    if len(vec) < len(query_vec):
-                        vec = vec + [0.0] * (len(query_vec) - len(vec))
-                    else:
-                        vec = vec[:len(query_vec)]
+                    # Pad or truncate vector to match query length
+                    if len(vec) != len(query_vec):
+                        if len(vec) < len(query_vec):
+                            vec = vec + [0.0] * (len(query_vec) - len(vec))
+                        else:
+                            vec = vec[:len(query_vec)]
 
-                # Note: Filters are not applied in this mock implementation
-                # In production, you'd load metadata and filter here
+                    # Note: Filters are not applied in this mock implementation
+                    # In production, you'd load metadata and filter here
 
-                sim = cos(query_vec, vec)
-                if not math.isnan(sim) and not math.isinf(sim):
-                    items.append((app_id, sim))
-                else:
-                    skipped_count += 1
+                    sim = cos(query_vec, vec)
+                    if not math.isnan(sim) and not math.isinf(sim):
+                        items.append((row, sim))
+                    else:
+                        skipped_count += 1
 
-            except Exception as e:
-                logger.warning(f"Error processing embedding for app_id {app_id}: {str(e)}")
-                skipped_count += 1
-                continue
+                except Exception as e:
+                    logger.warning(f"Error processing embedding for app_id {app_id}: {str(e)}")
+                    skipped_count += 1
+                    continue
 
         if skipped_count > 0:
             logger.debug(f"Skipped {skipped_count} invalid embeddings")
 
         if not items:
-            logger.warning("No valid embeddings found for similarity search")
-            return []
-
-        items.sort(key=lambda t: t[1], reverse=True)
-
-        # Build neighbors with metadata
-        neighbors = []
-        for app_id, sim in items[:k]:
-            try:
-                metadata = self._app_metadata.get(app_id, {})
-
-                # Handle NaN values from pandas
-                app_name = metadata.get('name')
-                category = metadata.get('category')
-
-                # Convert NaN to None
-                if app_name is not None and isinstance(app_name, float) and math.isnan(app_name):
-                    app_name = None
-                if category is not None and isinstance(category, float) and math.isnan(category):
-                    category = None
-
-                neighbors.append(Neighbor(
-                    app_id=app_id,
-                    similarity=float(sim),
-                    app_name=app_name,
-                    category=category
-                ))
-            except Exception as e:
-                logger.warning(f"Error building neighbor for app_id {app_id}: {str(e)}")
-                continue
-
-        return neighbors
\ No newline at end of file
+            if not degraded:
+                logger.warning("No valid embeddings found for similarity search")
+            return NeighborBatch(degraded=degraded)
+
+        with trace_stage("topk_select"):
+            items.sort(key=lambda t: t[1], reverse=True)
+            top = items[:k]
+
+        # Join metadata: gather pre-cleaned columns by index row
+        with trace_stage("metadata_join"):
+            app_ids, metadata_rows = self._aligned_rows(arm, index)
+            names, categories = self.ensure_metadata().gather([metadata_rows[row] for row, _ in top])
+            batch = NeighborBatch(
+                ids=[app_ids[row] for row, _ in top],
+                sims=[float(sim) for _, sim in top],
+                names=names,
+                categories=categories,
+                degraded=degraded,
+            )
+
+        return batch
@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+# Synthetic apps sent through the scoring path before the instance reports ready
+WARMUP_APPS = (
+    {"name": "warmup", "category": "Games", "features": ["sharing"]},
+    {"name": "warmup", "category": "Health & Fitness", "features": []},
+)
+
+
+class Readiness:
+    """Startup state reported by /readyz"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.ready = False
+        self.error: Optional[str] = None
+        self.load_timings_ms: Dict[str, float] = {}
+
+    def record(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self.load_timings_ms[name] = round(duration_ms, 1)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+
+    def mark_failed(self, error: str) -> None:
+        self.error = error
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "error": self.error,
+                "load_timings_ms": dict(self.load_timings_ms),
+            }
+
+
+def load_concurrently(loaders: Dict[str, Callable[[], Any]], readiness: Readiness) -> Dict[str, Any]:
+    """
+    Run independent loaders on a thread pool, timing each one.
+
+    Returns:
+        Dict mapping loader name to its result
+
+    Raises:
+        Exception: The first loader failure, after all loaders have finished
+    """
+    def timed(name: str, loader: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return loader()
+        finally:
+            readiness.record(name, (time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=len(loaders) or 1, thread_name_prefix="preload") as pool:
+        futures = {name: pool.submit(timed, name, loader) for name, loader in loaders.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def warm_up(emb_store, sim, performance_data: Optional[dict], rounds: int, top_k: int) -> int:
+    """
+    Send synthetic queries through vectorize -> search -> predict for each arm, so
+    lazy caches, numpy code paths and allocator pools are primed before real traffic.
+
+    Returns:
+        Number of warm-up queries run
+    """
+    from app.services.predictor import PerformancePredictor
+
+    queries = 0
+    for arm in ("v1", "v2"):
+        predictor = PerformancePredictor(arm, performance_data=performance_data or {})
+        for _ in range(rounds):
+            for app_meta in WARMUP_APPS:
+                query_vec = emb_store.vectorize(app_meta, arm)
+                batch = sim.search(query_vec, top_k, None, arm)
+                neighbors = batch.to_neighbors()
+                if neighbors:
+                    predictor.predict(app_meta, neighbors)
+                queries += 1
+    return queries
@@ -0,0 +1,177 @@
+# Module: admission.py
+"""
+Adaptive admission control (load shedding) for the scoring endpoints.
+
+Each protected endpoint has an AdaptiveLimiter: at most `limit` requests run
+at once, up to `max_queue` more wait (each for at most `queue_timeout_s`), and
+everything beyond that is answered immediately with 503 + Retry-After. The
+limit follows AIMD on windowed latency: it is cut multiplicatively when the
+window's p90 exceeds the target and grows by one while the limiter is
+saturated and latency is healthy.
+
+The limiter runs on the event loop only, so its state needs no locking.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.instrumentation.metrics import record_error
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with a bounded, time-limited wait queue and AIMD adjustment"""
+
+    def __init__(self, initial_limit: int = 16, min_limit: int = 2, max_limit: int = 64,
+                 max_queue: int = 64, queue_timeout_s: float = 0.05, target_latency_ms: float = 150.0,
+                 window_s: float = 1.0, backoff: float = 0.9):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.target_latency_ms = target_latency_ms
+        self.window_s = window_s
+        self.backoff = backoff
+
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._samples: List[float] = []
+        self._window_start = time.monotonic()
+        self._saturated = False  # some request could not start immediately in this window
+
+        # Counters
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False if the queue is full or the queue timeout expires"""
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return True
+
+        self._saturated = True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we stopped waiting: give it back
+                self.release(None)
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self, latency_ms: Optional[float]) -> None:
+        """Free a slot, feed the request's latency into the window and wake waiters"""
+        self.inflight -= 1
+        if latency_ms is not None:
+            self._samples.append(latency_ms)
+            self._maybe_adjust()
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(True)
+
+    def _maybe_adjust(self) -> None:
+        now = time.monotonic()
+        if now - self._window_start < self.window_s:
+            return
+        samples = sorted(self._samples)
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        if p90 > self.target_latency_ms:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        elif self._saturated:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+        self._samples = []
+        self._window_start = now
+        self._saturated = False
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware applying a per-endpoint AdaptiveLimiter to POST requests.
+
+    The limiters are passed in (see build_limiters) so their owner, e.g.
+    `app.state.admission_limiters`, can report on them.
+    """
+
+    def __init__(self, app, limiters: Dict[str, AdaptiveLimiter], retry_after_s: float = 1.0):
+        self.app = app
+        self.limiters = limiters
+        self._retry_after = str(max(1, math.ceil(retry_after_s))).encode()
+
+    async def __call__(self, scope, receive, send) -> None:
+        limiter = self.limiters.get(scope.get("path")) if scope["type"] == "http" else None
+        if limiter is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            record_error("load_shed")
+            await self._reject(send)
+            return
+
+        start = time.perf_counter()
+        latency_ms = None
+        try:
+            await self.app(scope, receive, send)
+            latency_ms = (time.perf_counter() - start) * 1000
+        finally:
+            limiter.release(latency_ms)
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": "Server overloaded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", self._retry_after),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_limiters(paths: List[str], **limiter_kwargs) -> Dict[str, AdaptiveLimiter]:
+    """One AdaptiveLimiter per protected path"""
+    return {path: AdaptiveLimiter(**limiter_kwargs) for path in paths}
+
+
+def get_admission_stats(limiters: Dict[str, AdaptiveLimiter]) -> Dict[str, Dict]:
+    """Limiter state per protected endpoint"""
+    return {path: limiter.snapshot() for path, limiter in limiters.items()}
@@ -0,0 +1,176 @@
+# Module: binary_format.py
+"""
+Compact columnar binary encoding of find-similar results.
+
+Served instead of JSON when the request's Accept header names MEDIA_TYPE.
+Little-endian, every section padded to 4 bytes so numeric columns can be read
+zero-copy (e.g. `numpy.frombuffer(buf, "<f4", n, offset)`):
+
+    header      4s magic b"MBNB", u8 version, u8 flags (FLAG_DEGRADED), u16 arm length, u32 row count n
+    arm         utf-8 bytes
+    ids         string table with n entries (row i is the i-th id)
+    sims        float32[n]
+    names       string table (distinct values) + u32[n] indices, NULL_INDEX for null
+    categories  string table (distinct values) + u32[n] indices, NULL_INDEX for null
+
+A string table is u32 count m, u32[m + 1] offsets into the data that follows,
+then the utf-8 data. Rows are sorted by similarity, highest first.
+"""
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models.neighbors import NeighborBatch
+
+
+MEDIA_TYPE = "application/vnd.mobupps.neighbors"
+MAGIC = b"MBNB"
+VERSION = 1
+NULL_INDEX = 0xFFFFFFFF
+FLAG_DEGRADED = 0x01  # partial top-k: the request deadline cut scoring short
+
+_HEADER = struct.Struct("<4sBBHI")
+_U32 = struct.Struct("<I")
+
+
+def _pad(out: bytearray) -> None:
+    out.extend(b"\0" * (-len(out) % 4))
+
+
+def _le(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode: str, data: bytes) -> array:
+    values = array(typecode, data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _write_strings(out: bytearray, values: Sequence[str]) -> None:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = array("I", [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    out += _U32.pack(len(encoded))
+    out += _le(offsets)
+    out += b"".join(encoded)
+    _pad(out)
+
+
+def _write_dictionary(out: bytearray, values: Sequence[Optional[str]]) -> None:
+    codes: Dict[str, int] = {}
+    indices = array("I")
+    for value in values:
+        if value is None:
+            indices.append(NULL_INDEX)
+        else:
+            indices.append(codes.setdefault(value, len(codes)))
+    _write_strings(out, list(codes))
+    out += _le(indices)
+
+
+def encode_neighbors(batch: NeighborBatch, arm: str, flags: int = 0) -> bytes:
+    """Encode a result batch in the columnar layout"""
+    if batch.degraded:
+        flags |= FLAG_DEGRADED
+    n = len(batch)
+    arm_bytes = arm.encode("utf-8")
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, flags, len(arm_bytes), n))
+    out += arm_bytes
+    _pad(out)
+    _write_strings(out, [str(app_id) for app_id in batch.ids])
+    out += _le(array("f", batch.sims))
+    _write_dictionary(out, batch.names)
+    _write_dictionary(out, batch.categories)
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, data: bytes, offset: int):
+        self.data = data
+        self.offset = offset
+
+    def take(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.data):
+            raise ValueError("Truncated neighbors payload")
+        chunk = self.data[self.offset:end]
+        self.offset = end + (-end % 4)
+        return chunk
+
+    def strings(self) -> List[str]:
+        (count,) = _U32.unpack(self.take(4))
+        offsets = _from_le("I", self.take(4 * (count + 1)))
+        blob = self.take(offsets[-1])
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+
+    def dictionary(self, n: int) -> List[Optional[str]]:
+        table = self.strings()
+        indices = _from_le("I", self.take(4 * n))
+        return [None if index == NULL_INDEX else table[index] for index in indices]
+
+
+def decode_neighbors(data: bytes) -> Tuple[NeighborBatch, str, int]:
+    """
+    Decode a columnar payload.
+
+    Returns:
+        (batch, arm, flags)
+
+    Raises:
+        ValueError: If the payload is not a supported neighbors encoding
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated neighbors payload")
+    magic, version, flags, arm_len, n = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported neighbors payload (magic={magic!r}, version={version})")
+    reader = _Reader(data, _HEADER.size)
+    arm = reader.take(arm_len).decode("utf-8")
+    ids = reader.strings()
+    sims = _from_le("f", reader.take(4 * n)).tolist()
+    names = reader.dictionary(n)
+    categories = reader.dictionary(n)
+    batch = NeighborBatch(ids=ids, sims=sims, names=names, categories=categories,
+                          degraded=bool(flags & FLAG_DEGRADED))
+    return batch, arm, flags
+
+
+def _media_ranges(accept: str) -> Dict[str, float]:
+    """Accept header as {media range: q}; an unparsable q counts as 0"""
+    ranges: Dict[str, float] = {}
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges[media_range.lower()] = q
+    return ranges
+
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    """
+    True if an Accept header names the columnar encoding with q > 0, at least
+    as preferred as JSON (wildcards only ever select JSON).
+    """
+    if not accept:
+        return False
+    ranges = _media_ranges(accept)
+    q_binary = ranges.get(MEDIA_TYPE, 0.0)
+    if q_binary <= 0:
+        return False
+    q_json = next((ranges[r] for r in ("application/json", "application/*", "*/*") if r in ranges), 0.0)
+    return q_binary >= q_json
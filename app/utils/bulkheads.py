@@ -0,0 +1,161 @@
+# Module: bulkheads.py
+"""
+Bulkhead executors: dedicated, size-bounded thread pools per endpoint class
+and A/B arm, so a burst on one (e.g. 128-d v2 searches) cannot starve the
+others or the event loop's default threadpool (/healthz, /metrics).
+
+Work is submitted with the caller's contextvars (correlation ID, request
+trace) copied into the pool thread. Each bulkhead bounds its backlog: when
+`max_queue` calls are already waiting, new ones are refused with BulkheadFull.
+"""
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.logging import get_logger
+
+
+logger = get_logger(__name__)
+
+# Environment variables read by the BLAS/OpenMP runtimes numpy may link against
+BLAS_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+class BulkheadFull(Exception):
+    """The bulkhead's wait queue is full"""
+
+
+class Bulkhead:
+    """A bounded thread pool with queue-depth accounting"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"bulkhead-{name}")
+        self._lock = Lock()
+        self.pending = 0  # submitted and not finished (queued + active)
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.active)
+
+    def _call(self, ctx: contextvars.Context, fn: Callable, args: tuple) -> Any:
+        with self._lock:
+            self.active += 1
+        try:
+            return ctx.run(fn, *args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _done(self, future: Future) -> None:
+        # Runs whether the job finished or was cancelled before a thread picked it up
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run fn(*args) on this bulkhead with the caller's context.
+
+        Raises:
+            BulkheadFull: If max_queue calls are already waiting
+        """
+        with self._lock:
+            if self.pending - self.active >= self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull(self.name)
+            self.pending += 1
+        ctx = contextvars.copy_context()
+        try:
+            future = self._executor.submit(self._call, ctx, fn, args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        # Cancelling the awaiting task cancels the job too if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+
+
+def configure_bulkheads(workers: Dict[str, int], max_queue: int) -> None:
+    """Create one bulkhead per name (threads start lazily, so this is safe before fork)"""
+    for name, max_workers in workers.items():
+        _bulkheads[name] = Bulkhead(name, max_workers, max_queue)
+
+
+def get_bulkhead(name: str) -> Optional[Bulkhead]:
+    return _bulkheads.get(name)
+
+
+async def run_in_bulkhead(name: str, fn: Callable, *args) -> Any:
+    """
+    Run fn(*args) on the named bulkhead, or on the default executor if bulkheads are not configured.
+
+    Raises:
+        BulkheadFull: If the bulkhead's wait queue is full
+    """
+    bulkhead = _bulkheads.get(name)
+    if bulkhead is not None:
+        return await bulkhead.run(fn, *args)
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, ctx.run, fn, *args)
+
+
+def bulkhead_stats() -> Dict[str, Dict[str, int]]:
+    """Per-bulkhead worker, queue-depth and rejection counters"""
+    return {name: bulkhead.stats() for name, bulkhead in _bulkheads.items()}
+
+
+def shutdown_bulkheads() -> None:
+    for bulkhead in _bulkheads.values():
+        bulkhead.shutdown()
+
+
+def configure_blas_threads(threads: int) -> None:
+    """
+    Cap numpy's BLAS/OpenMP threads per process (0 leaves the library default).
+
+    Environment variables only take effect if set before numpy is first imported;
+    threadpoolctl, when installed, also limits runtimes that are already loaded.
+    """
+    if threads <= 0:
+        return
+    for var in BLAS_THREAD_ENV_VARS:
+        os.environ.setdefault(var, str(threads))
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:  # optional dependency
+        return
+    threadpool_limits(limits=threads)
+    logger.info(f"BLAS threads limited to {threads}")
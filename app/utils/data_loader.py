@@ -2,7 +2,6 @@
 # Downloads data files from Google Drive on startup
 
 import os
-import gdown
 from pathlib import Path
 
 
@@ -37,7 +36,8 @@ class GoogleDriveDataLoader:
         # Extract file ID from various Google Drive URL formats
         file_id = self._extract_file_id(gdrive_url)
 
-        # Download using gdown
+        # Download using gdown (imported here: only needed when a file is missing)
+        import gdown
         gdown.download(
             f"https://drive.google.com/uc?id={file_id}",
             str(output_path),
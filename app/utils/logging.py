@@ -2,24 +2,100 @@
 """
 Structured logging utilities for MobUpps API
 Provides correlation ID tracking, request logging, and performance metrics
+
+With queued logging enabled, request threads only append the LogRecord to a
+bounded queue; formatting and stdout writes happen on a background listener
+thread. Hot-path events (http_request, http_response, ab_assignment, ...) can
+be sampled per event type before a record is even created.
 """
 import logging
+import logging.handlers
+import queue
+import random
 import sys
 import json
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from contextvars import ContextVar
 
 # Context variable for correlation ID (thread-safe for async)
 correlation_id_var: ContextVar[Optional[str]] = ContextVar('correlation_id', default=None)
 
+# event_type -> fraction of events to log (missing types are always logged)
+_sample_rates: Dict[str, float] = {}
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+_MISSING = object()
+
+
+def _record_correlation_id(record: logging.LogRecord) -> Optional[str]:
+    """Correlation ID captured at enqueue time, else from the current context"""
+    correlation_id = getattr(record, 'correlation_id', _MISSING)
+    if correlation_id is _MISSING:
+        correlation_id = correlation_id_var.get()
+    return correlation_id
+
+
+# JSON-encoded strings for values that repeat on every record (levels, logger/module/function names)
+_json_str = lru_cache(maxsize=4096)(json.dumps)
+
+_BASE_KEYS = frozenset(("timestamp", "level", "logger", "message", "module", "function", "line"))
+
 
 class StructuredFormatter(logging.Formatter):
     """JSON formatter for structured logging"""
 
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._ts_second: Optional[int] = None
+        self._ts_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        """ISO-8601 UTC timestamp; the per-second prefix is formatted once per second"""
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix}.{int((created - second) * 1_000_000):06d}Z"
+
     def format(self, record: logging.LogRecord) -> str:
+        extra_data = getattr(record, 'extra_data', None)
+        if extra_data and not _BASE_KEYS.isdisjoint(extra_data):
+            return self._format_slow(record)
+
+        # Fast path: splice pre-serialized fragments instead of building and dumping a dict
+        parts = [
+            '{"timestamp": "', self._timestamp(record.created),
+            '", "level": ', _json_str(record.levelname),
+            ', "logger": ', _json_str(record.name),
+            ', "message": ', json.dumps(record.getMessage()),
+            ', "module": ', _json_str(record.module),
+            ', "function": ', _json_str(record.funcName),
+            ', "line": ', str(record.lineno),
+        ]
+
+        # Add correlation ID if available
+        correlation_id = _record_correlation_id(record)
+        if correlation_id:
+            parts += [', "correlation_id": ', json.dumps(correlation_id)]
+
+        # Add exception info if present
+        if record.exc_info:
+            parts += [', "exception": ', json.dumps(self.formatException(record.exc_info))]
+
+        # Add any extra fields
+        if extra_data:
+            parts += [', ', json.dumps(extra_data, default=str)[1:-1]]
+
+        parts.append('}')
+        return "".join(parts)
+
+    def _format_slow(self, record: logging.LogRecord) -> str:
+        """Dict-based formatting, used when extra fields override base keys"""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat() + "Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -29,7 +105,7 @@ class StructuredFormatter(logging.Formatter):
         }
 
         # Add correlation ID if available
-        correlation_id = correlation_id_var.get()
+        correlation_id = _record_correlation_id(record)
         if correlation_id:
             log_data["correlation_id"] = correlation_id
 
@@ -38,10 +114,9 @@ class StructuredFormatter(logging.Formatter):
             log_data["exception"] = self.formatException(record.exc_info)
 
         # Add any extra fields
-        if hasattr(record, 'extra_data'):
-            log_data.update(record.extra_data)
+        log_data.update(record.extra_data)
 
-        return json.dumps(log_data)
+        return json.dumps(log_data, default=str)
 
 
 class ColoredConsoleFormatter(logging.Formatter):
@@ -58,7 +133,7 @@ class ColoredConsoleFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         color = self.COLORS.get(record.levelname, '')
-        correlation_id = correlation_id_var.get()
+        correlation_id = _record_correlation_id(record)
         cid_str = f" [cid:{correlation_id[:8]}]" if correlation_id else ""
 
         log_msg = f"{color}{record.levelname}{self.RESET} [{record.name}]{cid_str} {record.getMessage()}"
@@ -69,20 +144,54 @@ class ColoredConsoleFormatter(logging.Formatter):
         return log_msg
 
 
-def setup_logging(level: str = "INFO", structured: bool = False) -> None:
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and defers all formatting to the listener.
+
+    Only the correlation ID is captured on the calling thread (context
+    variables are not visible to the listener); records are dropped and
+    counted when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation_id = correlation_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level: str = "INFO", structured: bool = False, queued: bool = False,
+                  queue_size: int = 10000, sample_rates: Optional[Dict[str, float]] = None) -> None:
     """
     Configure application logging
 
     Args:
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         structured: If True, use JSON formatting; if False, use colored console
+        queued: If True, format and write on a background thread via a bounded queue
+        queue_size: Max records buffered before new ones are dropped (queued mode)
+        sample_rates: Fraction of events to keep per event_type, e.g. {"http_request": 0.1}
     """
+    global _queue_listener
+
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, level.upper()))
 
     # Remove existing handlers
+    stop_logging()
     root_logger.handlers.clear()
 
+    _sample_rates.clear()
+    _sample_rates.update(sample_rates or {})
+
     # Create console handler
     handler = logging.StreamHandler(sys.stdout)
 
@@ -93,7 +202,28 @@ def setup_logging(level: str = "INFO", structured: bool = False) -> None:
         formatter = ColoredConsoleFormatter()
 
     handler.setFormatter(formatter)
-    root_logger.addHandler(handler)
+
+    if queued:
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        _queue_listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _queue_listener.start()
+        root_logger.addHandler(NonBlockingQueueHandler(log_queue))
+    else:
+        root_logger.addHandler(handler)
+
+
+def stop_logging() -> None:
+    """Flush and stop the background log writer, if running"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def should_log(event_type: str) -> bool:
+    """Sampling decision for a hot-path event type (checked before building the record)"""
+    rate = _sample_rates.get(event_type)
+    return rate is None or rate >= 1.0 or random.random() < rate
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -113,6 +243,8 @@ def get_correlation_id() -> Optional[str]:
 
 def log_request(logger: logging.Logger, method: str, path: str, **kwargs: Any) -> None:
     """Log an incoming HTTP request"""
+    if not should_log("http_request"):
+        return
     extra_data = {
         "event_type": "http_request",
         "http_method": method,
@@ -123,7 +255,9 @@ def log_request(logger: logging.Logger, method: str, path: str, **kwargs: Any) -
 
 
 def log_response(logger: logging.Logger, status_code: int, latency_ms: float, **kwargs: Any) -> None:
-    """Log an HTTP response"""
+    """Log an HTTP response (server errors are never sampled out)"""
+    if status_code < 500 and not should_log("http_response"):
+        return
     extra_data = {
         "event_type": "http_response",
         "status_code": status_code,
@@ -135,6 +269,8 @@ def log_response(logger: logging.Logger, status_code: int, latency_ms: float, **
 
 def log_ab_assignment(logger: logging.Logger, partner_id: str, app_id: str, arm: str, **kwargs: Any) -> None:
     """Log an A/B test arm assignment"""
+    if not should_log("ab_assignment"):
+        return
     extra_data = {
         "event_type": "ab_assignment",
         "partner_id": partner_id,
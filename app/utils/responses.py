@@ -0,0 +1,65 @@
+# Module: responses.py
+"""
+Fast JSON responses built directly from internal result columns.
+
+Returning a Response from a route skips FastAPI's response_model validation and
+jsonable_encoder pass; the route keeps `response_model` so the OpenAPI schema
+is unchanged. Bodies are encoded with orjson when it is installed, otherwise
+assembled from pre-encoded JSON fragments with the stdlib encoder.
+"""
+import json
+from typing import Any, List, Optional
+
+from fastapi.responses import Response
+
+from app.models.neighbors import NeighborBatch
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response without validation; pass `content` or pre-encoded `body` bytes"""
+    media_type = "application/json"
+
+    def __init__(self, content: Any = None, body: Optional[bytes] = None, **kwargs):
+        self._body = body
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if self._body is not None:
+            return self._body
+        return dumps(content)
+
+
+def _fragment(value: Any) -> str:
+    return "null" if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def encode_similar(batch: NeighborBatch, arm: str) -> bytes:
+    """SimilarResponse JSON written straight from the result columns"""
+    if orjson is not None:
+        return orjson.dumps({
+            "neighbors": [
+                {"app_id": app_id, "similarity": sim, "app_name": name, "category": category}
+                for app_id, sim, name, category in zip(batch.ids, batch.sims, batch.names, batch.categories)
+            ],
+            "ab_arm": arm,
+            "degraded": batch.degraded,
+        })
+    rows: List[str] = [
+        f'{{"app_id":{_fragment(app_id)},"similarity":{float(sim)!r},'
+        f'"app_name":{_fragment(name)},"category":{_fragment(category)}}}'
+        for app_id, sim, name, category in zip(batch.ids, batch.sims, batch.names, batch.categories)
+    ]
+    degraded = "true" if batch.degraded else "false"
+    return f'{{"neighbors":[{",".join(rows)}],"ab_arm":{_fragment(arm)},"degraded":{degraded}}}'.encode("utf-8")
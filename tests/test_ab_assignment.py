@@ -1,8 +1,63 @@
-from app.services.ab_test import ABTestController, ABPolicy
+import hashlib
+import json
+
+import pytest
+
+from app.services.ab_test import ABTestController, ABPolicy, MODEL_LAYER
 
 
 def test_sticky_assignment():
     ab = ABTestController(ABPolicy(v1_weight=0.5, sticky=True))
     a1 = ab.pick_arm("p1", "a1")
     a2 = ab.pick_arm("p1", "a1")
-    assert a1 == a2  # sticky
\ No newline at end of file
+    assert a1 == a2  # sticky
+
+def test_layers_and_sticky_reweight():
+    ab = ABTestController(ABPolicy(v1_weight=0.5, sticky=True))
+    ab.engine.configure({"ann_params": {"fast": 1, "accurate": 1}})
+    keys = [(f"p{i}", f"a{i}") for i in range(2000)]
+
+    before = {key: ab.assign(*key) for key in keys}
+    assert all(set(a) == {"model", "ann_params"} for a in before.values())
+    assert 800 < sum(a["model"] == "v1" for a in before.values()) < 1200
+
+    # Growing v1 only moves v2 buckets over; nobody leaves v1
+    ab.set_v1_weight(0.7)
+    after = {key: ab.pick_arm(*key) for key in keys}
+    assert all(after[k] == "v1" for k, a in before.items() if a["model"] == "v1")
+    assert 1200 < sum(arm == "v1" for arm in after.values()) < 1600
+
+
+def test_legacy_md5_bucketing_keeps_existing_assignments():
+    ab = ABTestController(ABPolicy(v1_weight=0.5, sticky=True, legacy_md5=True))
+    for i in range(200):
+        key = f"p{i}:a{i}"
+        u = int(hashlib.md5(key.encode()).hexdigest(), 16) / float(16**32)
+        expected = "v1" if u < 0.5 else "v2"
+        assert ab.pick_arm(f"p{i}", f"a{i}") == expected
+        assert ab.assign(f"p{i}", f"a{i}")[MODEL_LAYER] == expected
+
+
+def test_legacy_mode_routes_model_reloads_to_threshold():
+    ab = ABTestController(ABPolicy(v1_weight=0.5, sticky=True, legacy_md5=True))
+    assert MODEL_LAYER not in ab.engine.layers  # only the MD5 hash runs for the model arm
+
+    ab.engine.configure({MODEL_LAYER: {"v1": 3, "v2": 1}, "ann_params": {"fast": 1}})
+    assert ab.policy.v1_weight == 0.75
+    assert ab.assign("p1", "a1") == {"ann_params": "fast", MODEL_LAYER: ab._legacy_arm("p1:a1", 0.75)}
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_model_layer_rejects_unknown_arms(tmp_path, legacy):
+    ab = ABTestController(ABPolicy(v1_weight=0.5, sticky=True, legacy_md5=legacy))
+    with pytest.raises(ValueError):
+        ab.engine.configure({"ann_params": {"fast": 1}, MODEL_LAYER: {"v1": 1, "v3": 1}})
+    assert "ann_params" not in ab.engine.layers  # nothing from the bad config was applied
+    assert ab.policy.v1_weight == 0.5
+
+    path = tmp_path / "experiments.json"
+    path.write_text(json.dumps({MODEL_LAYER: {"v3": 1}}))
+    with pytest.raises(ValueError):
+        ab.engine.reload_if_changed(str(path))
+    assert ab.engine.reload_if_changed(str(path)) is False  # reported once, not on every poll
+    assert ab.pick_arm("p1", "a1") in {"v1", "v2"}
@@ -0,0 +1,65 @@
+import json
+import threading
+
+from app.instrumentation.ab_events import ABEventLog
+
+
+def test_events_are_batched_and_rotated(tmp_path):
+    log = ABEventLog(str(tmp_path), batch_size=10, flush_interval_s=0.05, max_file_bytes=600)
+    log.start()
+    for i in range(25):
+        assert log.record("exposure", arm="v1", app_id=f"a{i}", partner_id="p", latency_ms=3, neighbor_count=10)
+    log.stop()
+
+    files = sorted(tmp_path.glob("ab-events-*.ndjson"))
+    events = [json.loads(line) for f in files for line in f.read_text().splitlines()]
+    assert len(files) > 1
+    assert [e["app_id"] for e in events] == [f"a{i}" for i in range(25)]
+    assert events[0]["type"] == "exposure" and events[0]["arm"] == "v1"
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = ABEventLog(str(tmp_path), queue_size=2)  # writer not started
+    assert log.record("outcome", score=0.5)
+    assert log.record("outcome", score=0.5)
+    assert not log.record("outcome", score=0.5)
+    assert log.dropped == 1
+
+
+def test_failed_write_counts_batch_as_dropped(tmp_path):
+    log = ABEventLog(str(tmp_path), batch_size=10, flush_interval_s=0.05)
+
+    def fail(batch):
+        raise OSError("disk full")
+
+    log._write = fail
+    log.start()
+    for i in range(3):
+        log.record("exposure", arm="v1", app_id=f"a{i}")
+    log.stop()
+    assert log.dropped == 3
+    assert log.written == 0
+
+
+def test_stop_leaves_file_to_a_slow_writer(tmp_path):
+    log = ABEventLog(str(tmp_path), batch_size=1, flush_interval_s=0.05)
+    release = threading.Event()
+    write = log._write
+
+    def slow_write(batch):
+        release.wait(5)
+        write(batch)
+
+    log._write = slow_write
+    log.start()
+    log.record("exposure", arm="v1", app_id="a1")
+    writer = log._thread
+    log.stop(timeout=0.1)
+    assert writer.is_alive()  # still blocked in the write: the file must not be closed under it
+
+    release.set()
+    writer.join(5)
+    assert not writer.is_alive()
+    assert log._file is None  # closed by the writer on exit
+    events = [json.loads(line) for f in tmp_path.glob("ab-events-*.ndjson") for line in f.read_text().splitlines()]
+    assert [e["app_id"] for e in events] == ["a1"]
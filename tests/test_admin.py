@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def test_admin_routes_hidden_without_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/admin/slow-requests").status_code == 404
+    assert client.post("/admin/profile?duration_s=1").status_code == 404
+
+
+def test_admin_routes_require_matching_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    assert client.get("/admin/slow-requests").status_code == 403
+    assert client.get("/admin/slow-requests", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    r = client.get("/admin/slow-requests", headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200
+    assert "endpoints" in r.json()
+
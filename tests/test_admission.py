@@ -0,0 +1,82 @@
+import asyncio
+
+from app.utils.admission import AdaptiveLimiter, AdmissionControlMiddleware, build_limiters, get_admission_stats
+
+
+def test_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, max_queue=1, queue_timeout_s=0.05)
+        assert await limiter.acquire()
+
+        # One request may wait; the next is shed immediately
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert await limiter.acquire() is False
+        assert limiter.rejected == 1
+
+        # Releasing hands the slot to the waiter
+        limiter.release(5.0)
+        assert await waiting is True
+        assert limiter.inflight == 1
+
+        # A waiter whose queue timeout expires gives up without leaking a slot
+        assert await limiter.acquire() is False
+        assert limiter.timed_out == 1
+        limiter.release(5.0)
+        assert limiter.inflight == 0
+        assert limiter.snapshot()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_limit_follows_windowed_latency():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, max_limit=12, target_latency_ms=100, window_s=0)
+
+    limiter.inflight = 1
+    limiter.release(500.0)  # slow window: multiplicative decrease
+    assert limiter.limit == 9.0
+
+    for _ in range(5):
+        limiter._saturated = True
+        limiter.inflight = 1
+        limiter.release(20.0)  # healthy and saturated: additive increase, capped
+    assert limiter.limit == 12.0
+
+    limiter.inflight = 1
+    limiter.release(20.0)  # healthy but not saturated: unchanged
+    assert limiter.limit == 12.0
+
+
+def test_middleware_returns_503_with_retry_after():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    limiters = build_limiters(["/api/v1/predict"], initial_limit=1, max_queue=0)
+    middleware = AdmissionControlMiddleware(app, limiters, retry_after_s=2)
+    scope = {"type": "http", "method": "POST", "path": "/api/v1/predict"}
+
+    async def call():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, None, send)
+        return sent
+
+    async def scenario():
+        first = asyncio.ensure_future(call())
+        await asyncio.sleep(0)
+        shed = await call()
+        release.set()
+        return await first, shed
+
+    ok, shed = asyncio.run(scenario())
+    assert ok[0]["status"] == 200
+    assert shed[0]["status"] == 503
+    assert (b"retry-after", b"2") in shed[0]["headers"]
+    assert get_admission_stats(limiters)["/api/v1/predict"]["rejected"] == 1
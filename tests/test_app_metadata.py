@@ -0,0 +1,37 @@
+import pickle
+
+from app.services.app_metadata import MISSING, AppMetadataStore
+
+
+RECORDS = {
+    "app_1": {"name": "Runner", "category": "Health & Fitness"},
+    "app_2": {"name": float("nan"), "category": "Games"},
+    "app_3": {"name": "Chess", "category": "Games"},
+    "app_4": {"name": "Notes", "category": float("nan")},
+}
+
+
+def test_columns_are_cleaned_and_dictionary_encoded():
+    store = AppMetadataStore(RECORDS)
+    assert len(store) == 4
+    assert store.names == ["Runner", None, "Chess", "Notes"]
+    assert store.categories == ["Health & Fitness", "Games"]
+    assert list(store.category_codes) == [0, 1, 1, MISSING]
+    assert store.category_code("Games") == 1
+    assert store.category_code("Finance") == MISSING
+
+
+def test_align_and_gather():
+    store = AppMetadataStore(RECORDS)
+    rows = store.align(["app_3", "unknown", "app_4", "app_2"])
+    assert list(rows) == [2, MISSING, 3, 1]
+    names, categories = store.gather(rows)
+    assert names == ["Chess", None, "Notes", None]
+    assert categories == ["Games", None, None, "Games"]
+
+
+def test_load(tmp_path):
+    path = tmp_path / "app_metadata.pkl"
+    path.write_bytes(pickle.dumps(RECORDS))
+    assert AppMetadataStore.load(str(path)).names[0] == "Runner"
+    assert len(AppMetadataStore.load(str(tmp_path / "missing.pkl"))) == 0
@@ -0,0 +1,54 @@
+import struct
+
+import pytest
+
+from app.models.neighbors import NeighborBatch
+from app.utils.binary_format import FLAG_DEGRADED, MAGIC, accepts_binary, decode_neighbors, encode_neighbors
+
+
+def test_roundtrip():
+    batch = NeighborBatch(
+        ids=["app_1", "app_2", "app_3"],
+        sims=[0.75, 0.5, 0.25],
+        names=["Runner", None, "Runner"],
+        categories=["Games", "Health & Fitness", None],
+        degraded=True,
+    )
+    data = encode_neighbors(batch, "v2")
+    assert data[:4] == MAGIC
+
+    decoded, arm, flags = decode_neighbors(data)
+    assert (arm, flags) == ("v2", FLAG_DEGRADED)
+    assert decoded == batch
+
+    empty, arm, _ = decode_neighbors(encode_neighbors(NeighborBatch(), "v1"))
+    assert len(empty) == 0 and arm == "v1"
+
+
+def test_sims_are_aligned_float32():
+    batch = NeighborBatch(ids=["a", "bc"], sims=[0.1, 0.2], names=[None, None], categories=[None, None])
+    data = encode_neighbors(batch, "v1")
+    # header (12) + arm padded (4) + id table: count, 3 offsets, "abc" padded to 4
+    offset = 12 + 4 + 4 + 12 + 4
+    assert offset % 4 == 0
+    sims = struct.unpack_from("<2f", data, offset)
+    assert sims == pytest.approx((0.1, 0.2))
+
+
+def test_rejects_bad_payload():
+    with pytest.raises(ValueError):
+        decode_neighbors(b"JSON{}" + b"\0" * 16)
+    data = encode_neighbors(NeighborBatch(ids=["a"], sims=[1.0], names=["x"], categories=["y"]), "v1")
+    with pytest.raises(ValueError):
+        decode_neighbors(data[:-4])
+
+
+def test_accepts_binary():
+    assert accepts_binary("application/vnd.mobupps.neighbors, application/json;q=0.5")
+    assert not accepts_binary("application/json")
+    assert not accepts_binary(None)
+    assert accepts_binary("application/vnd.mobupps.neighbors;q=0.9, */*;q=0.1")
+    assert not accepts_binary("application/vnd.mobupps.neighbors;q=0")
+    assert not accepts_binary("application/vnd.mobupps.neighbors;q=0.2, application/json")
+    assert not accepts_binary("application/vnd.mobupps.neighbors-v2")
+    assert not accepts_binary("*/*")
@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from app.utils.bulkheads import Bulkhead, BulkheadFull
+
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_runs_on_own_threads_with_caller_context():
+    bulkhead = Bulkhead("find_similar:v1", max_workers=2, max_queue=4)
+
+    def work():
+        return threading.current_thread().name, request_id.get()
+
+    async def scenario():
+        request_id.set("abc")
+        return await bulkhead.run(work)
+
+    thread_name, seen = asyncio.run(scenario())
+    assert thread_name.startswith("bulkhead-find_similar:v1")
+    assert seen == "abc"
+    assert bulkhead.stats()["completed"] == 1
+    bulkhead.shutdown()
+
+
+def test_rejects_when_queue_is_full():
+    bulkhead = Bulkhead("predict", max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(bulkhead.run(gate.wait))
+        while bulkhead.stats()["active"] < 1:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(bulkhead.run(lambda: "queued"))
+        await asyncio.sleep(0)
+        assert bulkhead.stats()["queued"] == 1
+
+        with pytest.raises(BulkheadFull):
+            await bulkhead.run(lambda: "rejected")
+
+        gate.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    stats = bulkhead.stats()
+    assert (stats["rejected"], stats["completed"], stats["queued"], stats["active"]) == (1, 2, 0, 0)
+    bulkhead.shutdown()
+
+
+def test_cancelled_waiter_does_not_leak_queue_slot():
+    bulkhead = Bulkhead("predict", max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(bulkhead.run(gate.wait))
+        while bulkhead.stats()["active"] < 1:
+            await asyncio.sleep(0.001)
+
+        # Client disconnects while its call is still waiting for a thread
+        queued = asyncio.ensure_future(bulkhead.run(lambda: "never runs"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert bulkhead.stats()["queued"] == 0
+
+        gate.set()
+        await running
+        return await bulkhead.run(lambda: "accepted")
+
+    assert asyncio.run(scenario()) == "accepted"
+    stats = bulkhead.stats()
+    assert (stats["completed"], stats["queued"], stats["active"]) == (2, 0, 0)
+    assert bulkhead.pending == 0
+    bulkhead.shutdown()
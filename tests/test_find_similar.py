@@ -0,0 +1,67 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import api_v1
+
+
+client = TestClient(app)
+
+FAKE_INDEX = {f"app_{i}": {"vec": [i*0.01]*128} for i in range(1000)}
+PAYLOAD = {"app": {"name": "Runner", "category": "Health & Fitness"}, "partner_id": "p1", "app_id": "a1", "top_k": 5}
+
+
+@pytest.fixture(autouse=True)
+def fake_index(monkeypatch):
+    monkeypatch.setattr(api_v1._emb_store, "get_by_arm", lambda arm: FAKE_INDEX)
+
+
+def test_find_similar_without_deadline():
+    r = client.post("/api/v1/find-similar", json=PAYLOAD)
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["neighbors"]) == 5
+    assert body["degraded"] is False
+
+
+@pytest.mark.parametrize("headers, payload", [
+    ({"X-Request-Deadline-Ms": "1"}, PAYLOAD),
+    ({}, {**PAYLOAD, "deadline_ms": 1}),
+    # the tighter of header and body wins
+    ({"X-Request-Deadline-Ms": "1"}, {**PAYLOAD, "deadline_ms": 60000}),
+])
+def test_find_similar_expired_deadline_returns_partial(headers, payload):
+    r = client.post("/api/v1/find-similar", json=payload, headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["degraded"] is True
+    assert len(body["neighbors"]) == 5
+
+
+def test_find_similar_generous_deadline_not_degraded():
+    r = client.post("/api/v1/find-similar", json=PAYLOAD, headers={"X-Request-Deadline-Ms": "60000"})
+    assert r.status_code == 200
+    assert r.json()["degraded"] is False
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-5", "nan"])
+def test_find_similar_rejects_invalid_deadline_header(value):
+    r = client.post("/api/v1/find-similar", json=PAYLOAD, headers={"X-Request-Deadline-Ms": value})
+    assert r.status_code == 400
+
+
+def test_find_similar_rejects_invalid_deadline_field():
+    r = client.post("/api/v1/find-similar", json={**PAYLOAD, "deadline_ms": 0})
+    assert r.status_code == 422
+
+
+@pytest.mark.parametrize("accept, media_type", [
+    ("application/json", "application/json"),
+    ("application/vnd.mobupps.neighbors", "application/vnd.mobupps.neighbors"),
+    ("application/vnd.mobupps.neighbors;q=0, application/json", "application/json"),
+])
+def test_find_similar_negotiates_and_varies_on_accept(accept, media_type):
+    r = client.post("/api/v1/find-similar", json=PAYLOAD, headers={"Accept": accept})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(media_type)
+    assert "accept" in r.headers["vary"].lower()
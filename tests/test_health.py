@@ -8,4 +8,51 @@ client = TestClient(app)
 def test_health():
     r = client.get("/healthz")
     assert r.status_code == 200
-    assert r.json()["status"] == "ok"
\ No newline at end of file
+    assert r.json()["status"] == "ok"
+
+def test_correlation_id_echoed():
+    r = client.get("/healthz", headers={"X-Correlation-ID": "abc-123"})
+    assert r.status_code == 200
+    assert r.headers["X-Correlation-ID"] == "abc-123"
+    assert client.get("/healthz").headers["X-Correlation-ID"]
+
+
+def test_readyz_reports_state():
+    r = client.get("/readyz")
+    body = r.json()
+    assert r.status_code == (200 if body["ready"] else 503)
+    assert {"load_timings_ms", "index_sizes", "metadata_apps", "performance_cache_apps"} <= body.keys()
+
+
+def test_shed_requests_carry_cors_headers(monkeypatch):
+    limiter = app.state.admission_limiters["/api/v1/predict"]
+
+    async def refuse():
+        return False
+
+    monkeypatch.setattr(limiter, "acquire", refuse)
+    r = client.post("/api/v1/predict", json={}, headers={"Origin": "http://localhost:3000"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"]
+    assert r.headers["Access-Control-Allow-Origin"] == "http://localhost:3000"
+    assert "retry-after" in r.headers["Access-Control-Expose-Headers"].lower()
+
+
+def test_slow_requests_keyed_by_route():
+    from app.instrumentation.slow_requests import configure_slow_requests, get_slow_request_buffer
+
+    configure_slow_requests(per_endpoint=5, window_s=60)
+    for i in range(3):
+        assert client.get(f"/nope/{i}").status_code == 404
+    client.get("/healthz")
+    assert list(get_slow_request_buffer().snapshot()) == ["/healthz"]
+
+
+def test_request_metrics_keyed_by_route():
+    from app.instrumentation.metrics import get_metrics_summary
+
+    for i in range(3):
+        client.get(f"/junk/{i}")
+    endpoints = get_metrics_summary()["requests"]["by_endpoint"]
+    assert not any(key.startswith("/junk/") for key in endpoints)
+    assert endpoints["unmatched"] >= 3
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+
+# Cumulative `python -X importtime` budget for `import app.main` (microseconds)
+IMPORT_BUDGET_US = 2_500_000
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def test_serving_path_does_not_import_pandas():
+    result = _run("import sys, app.main; print('pandas' in sys.modules, 'gdown' in sys.modules)")
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_app_main_import_time_budget():
+    stderr = _run("import app.main").stderr
+    cumulative_us = None
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "app.main":
+            cumulative_us = int(parts[1])
+    assert cumulative_us is not None
+    assert cumulative_us < IMPORT_BUDGET_US, f"import app.main took {cumulative_us / 1000:.0f}ms"
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+
+from app.utils import logging as app_logging
+from app.utils.logging import NonBlockingQueueHandler, StructuredFormatter, correlation_id_var
+
+
+def _record(msg="hello", **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 10, msg, None, None, func="fn")
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_structured_fast_path_is_valid_json():
+    record = _record('say "hi"', extra_data={"event_type": "http_request", "http_path": "/x"}, correlation_id="cid-1")
+    data = json.loads(StructuredFormatter().format(record))
+    assert data["message"] == 'say "hi"'
+    assert data["level"] == "INFO" and data["logger"] == "app.test"
+    assert data["correlation_id"] == "cid-1"
+    assert data["event_type"] == "http_request"
+    assert data["timestamp"].endswith("Z")
+
+
+def test_queue_handler_captures_correlation_id_and_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    token = correlation_id_var.set("cid-2")
+    try:
+        handler.handle(_record())
+        handler.handle(_record())
+    finally:
+        correlation_id_var.reset(token)
+
+    assert handler.queue.get_nowait().correlation_id == "cid-2"
+    assert handler.dropped == 1
+
+
+def test_sampling_rates():
+    app_logging._sample_rates.update({"http_request": 0.0})
+    try:
+        assert not app_logging.should_log("http_request")
+        assert app_logging.should_log("http_response")
+    finally:
+        app_logging._sample_rates.clear()
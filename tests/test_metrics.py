@@ -0,0 +1,168 @@
+import random
+import statistics
+import threading
+
+from app.instrumentation.metrics import (
+    LatencyHistogram,
+    LatencyStats,
+    MetricsCollector,
+    StreamingMoments,
+    sequential_test,
+)
+
+
+def test_streaming_moments_match_batch_statistics():
+    values = [random.gauss(50, 5) for _ in range(500)]
+    m = StreamingMoments()
+    for v in values:
+        m.add(v)
+    assert m.count == 500
+    assert abs(m.mean - statistics.mean(values)) < 1e-9
+    assert abs(m.variance - statistics.variance(values)) < 1e-6
+    lo, hi = m.confidence_interval()
+    assert lo < m.mean < hi
+
+
+def test_ab_arm_stats_and_sequential_test():
+    collector = MetricsCollector()
+    rng = random.Random(7)
+    for _ in range(400):
+        collector.record_ab_metrics("v1", latency_ms=rng.gauss(30, 3), score=rng.gauss(0.5, 0.05))
+        collector.record_ab_metrics("v2", latency_ms=rng.gauss(40, 3), score=rng.gauss(0.5, 0.05))
+
+    ab = collector.get_summary()["ab_tests"]
+    assert ab["arm_stats"]["v1"]["latency_ms"]["count"] == 400
+    assert ab["v2_vs_v1"]["latency_ms"]["significant"]
+    assert ab["v2_vs_v1"]["latency_ms"]["difference"] > 5
+
+
+def test_sequential_test_needs_samples():
+    assert sequential_test(StreamingMoments(), StreamingMoments())["significant"] is False
+
+
+def test_latency_histogram_percentiles_within_relative_accuracy():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(3, 0.8) for _ in range(5000)]
+    stats = LatencyStats()
+    for v in values:
+        stats.add_sample(v)
+
+    ordered = sorted(values)
+    for q in (0.50, 0.95, 0.99):
+        exact = ordered[int(len(ordered) * q)]
+        assert abs(stats.percentile(q) - exact) <= exact * LatencyHistogram.RELATIVE_ACCURACY * 1.01
+
+    other = LatencyStats()
+    other.add_sample(10_000.0)
+    stats.merge(other)
+    assert stats.count == 5001
+    assert stats.max_ms == 10_000.0
+
+
+def test_sharded_counters_merge_across_threads():
+    collector = MetricsCollector()
+
+    def worker(arm):
+        for _ in range(1000):
+            collector.record_request("/api/v1/find-similar", 200, 5.0)
+            collector.record_ab_assignment("/api/v1/find-similar", arm)
+            collector.record_ab_metrics(arm, latency_ms=5.0)
+
+    threads = [threading.Thread(target=worker, args=("v1" if i % 2 else "v2",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    summary = collector.get_summary()
+    assert summary["requests"]["total"] == 8000
+    assert summary["latencies"]["/api/v1/find-similar"]["count"] == 8000
+    assert summary["ab_tests"]["by_arm"] == {"v1": 4000, "v2": 4000}
+    assert summary["ab_tests"]["arm_stats"]["v1"]["latency_ms"]["count"] == 4000
+
+    # The exited threads' shards were folded into one retired shard, windows included
+    assert len(collector._shards) == 1
+    assert collector.window_stats(endpoint="/api/v1/find-similar")["requests"] == 8000
+    assert collector.window_stats(arm="v1")["requests"] == 4000
+    assert collector.get_summary()["requests"]["total"] == 8000
+
+    collector.reset()
+    assert collector.get_summary()["requests"]["total"] == 0
+
+
+def test_prometheus_exposition():
+    from app.instrumentation.prometheus import render_prometheus
+
+    collector = MetricsCollector()
+    for latency in (3.0, 30.0, 300.0):
+        collector.record_request("/api/v1/find-similar", 200, latency)
+    collector.record_ab_assignment("/api/v1/find-similar", "v1")
+
+    text = render_prometheus(collector, 1.0, [("mobupps_embeddings_loaded", "Loaded.", {(("arm", "v1"),): 100})])
+    assert 'mobupps_requests_total{endpoint="/api/v1/find-similar"} 3' in text
+    assert 'mobupps_request_duration_seconds_bucket{endpoint="/api/v1/find-similar",le="0.005"} 1' in text
+    assert 'mobupps_request_duration_seconds_bucket{endpoint="/api/v1/find-similar",le="0.05"} 2' in text
+    assert 'mobupps_request_duration_seconds_bucket{endpoint="/api/v1/find-similar",le="+Inf"} 3' in text
+    assert 'mobupps_ab_assignments_total{endpoint="/api/v1/find-similar",arm="v1"} 1' in text
+    assert 'mobupps_embeddings_loaded{arm="v1"} 100' in text
+
+
+def test_sliding_window_rotation():
+    from app.instrumentation.metrics import WINDOW_BUCKET_S, SlidingWindow, WindowTotals
+
+    window = SlidingWindow()
+    now = 1_000_000.0
+    window.add(10.0, now=now - 20 * 60)  # 20 minutes ago: outside every window
+    window.add(10.0, now=now - 4 * 60)
+    window.add(100.0, error=True, now=now)
+
+    def totals(buckets):
+        t = WindowTotals()
+        window.collect(buckets, now, t)
+        return t
+
+    assert totals(6).requests == 1 and totals(6).errors == 1
+    assert totals(30).requests == 2
+    assert totals(90).requests == 2
+    assert abs(totals(30).quantile(0.99) - 100.0) < 1.0
+
+    # A write a full ring later reuses the slot and clears the stale bucket
+    window.add(5.0, now=now + 90 * WINDOW_BUCKET_S)
+    t = WindowTotals()
+    window.collect(1, now + 90 * WINDOW_BUCKET_S, t)
+    assert t.requests == 1 and t.errors == 0
+
+
+def test_window_stats_per_endpoint_and_arm():
+    collector = MetricsCollector()
+    collector.record_request("/api/v1/predict", 200, 20.0)
+    collector.record_request("/api/v1/predict", 503, 1.0)
+    collector.record_ab_metrics("v2", latency_ms=40.0)
+
+    stats = collector.window_stats(endpoint="/api/v1/predict", window="1m")
+    assert stats["requests"] == 2 and stats["error_rate"] == 0.5
+    assert collector.window_stats(arm="v2")["requests"] == 1
+    windows = collector.get_summary()["windows"]
+    assert set(windows["endpoints"]["/api/v1/predict"]) == {"1m", "5m", "15m"}
+
+
+def test_gc_pause_histograms():
+    import gc
+
+    from app.instrumentation.gc_monitor import install_gc_monitor, uninstall_gc_monitor
+    from app.instrumentation.prometheus import render_prometheus
+
+    collector = MetricsCollector()
+    install_gc_monitor(collector)
+    try:
+        gc.collect(0)
+        gc.collect(2)
+    finally:
+        uninstall_gc_monitor()
+    gc.collect(2)  # not recorded after uninstall
+
+    assert collector.gc_pauses[0].count >= 1
+    assert collector.gc_pauses[2].count == 1
+    summary = collector.get_summary()["gc"]
+    assert summary["gen2"]["count"] == 1
+    assert 'mobupps_gc_pause_seconds_count{generation="2"} 1' in render_prometheus(collector, 1.0)
@@ -0,0 +1,91 @@
+import os
+import time
+
+from app.services.performance_data import PerformanceAggregator
+
+
+def test_refresh_folds_new_partitions(tmp_path):
+    base = tmp_path / "historical_performance.csv"
+    base.write_text(
+        "app_id,clicks,impressions,event_count,mmp_offer_default_revenue\n"
+        "a1,10,1000,5,0.2\n"
+        "a2,4,100,2,0.4\n"
+    )
+    partitions = tmp_path / "partitions"
+    partitions.mkdir()
+
+    agg = PerformanceAggregator(str(base), str(partitions), partition_settle_s=0.0)
+    first = agg.load()
+    assert first["a1"]["clicks"] == 10
+    assert agg.refresh() is None  # nothing new yet
+
+    (partitions / "2025-10-20.csv").write_text(
+        "app_id,clicks,impressions,event_count,mmp_offer_default_revenue\n"
+        "a1,5,500,1,0.4\n"
+    )
+    second = agg.refresh()
+
+    assert second is not first
+    assert second["a1"]["clicks"] == 15
+    assert second["a1"]["impressions"] == 1500
+    assert abs(second["a1"]["mmp_offer_default_revenue"] - 0.3) < 1e-9
+    assert second["a2"] is first["a2"]  # untouched apps are shared
+    assert first["a1"]["clicks"] == 10  # previous snapshot is never mutated
+    assert agg.refresh() is None
+
+
+def test_refresh_retries_unreadable_and_unsettled_partitions(tmp_path):
+    base = tmp_path / "historical_performance.csv"
+    base.write_text(
+        "app_id,clicks,impressions,event_count,mmp_offer_default_revenue\n"
+        "a1,10,1000,5,0.2\n"
+    )
+    partitions = tmp_path / "partitions"
+    partitions.mkdir()
+    agg = PerformanceAggregator(str(base), str(partitions), partition_settle_s=60.0)
+    agg.load()
+
+    settled = time.time() - 120
+    partial = partitions / "2025-10-20.csv"
+    partial.write_text("app_id,clicks\n")  # header only, rest not written yet
+    os.utime(partial, (settled, settled))
+    assert agg.refresh() is None  # missing columns: not folded, not marked seen
+
+    partial.write_text(
+        "app_id,clicks,impressions,event_count,mmp_offer_default_revenue\n"
+        "a1,5,500,1,0.4\n"
+    )
+    assert agg.refresh() is None  # just modified: left until it settles
+
+    os.utime(partial, (settled, settled))
+    snapshot = agg.refresh()
+    assert snapshot["a1"]["clicks"] == 15
+    assert agg.refresh() is None
+
+
+def test_windowed_and_decayed_ctr(tmp_path):
+    base = tmp_path / "historical_performance.csv"
+    base.write_text(
+        "app_id,date,clicks,impressions\n"
+        "a1,2025-06-01,90,999\n"
+        "a1,2025-10-18,1,99\n"
+        "a1,2025-10-20,1,99\n"
+        "a2,2025-06-01,5,100\n"
+    )
+
+    agg = PerformanceAggregator(str(base), "", date_column="date", decay_half_life_days=14.0)
+    perf = agg.load()["a1"]
+
+    assert perf["ctr"] == 92 / 1198
+    assert perf["ctr_7d"] == 2 / 199
+    assert perf["ctr_30d"] == 2 / 199
+    assert perf["ctr_90d"] == 2 / 199
+    assert perf["ctr_7d"] < perf["ctr_decayed"] < perf["ctr"]
+
+    # No impressions in a window: the key is left out (readers fall back to lifetime CTR)
+    stale = agg.snapshot["a2"]
+    assert stale["ctr"] == 5 / 101
+    assert not {"ctr_7d", "ctr_30d", "ctr_90d"} & stale.keys()
+    # Decay weights every day of an old-only app alike, so its decayed CTR stays at its lifetime rate
+    assert abs(stale["ctr_decayed"] - 5 / 100) < 1e-9
+    assert abs(stale["ctr_decayed"] - stale["ctr"]) / stale["ctr"] < 0.02
@@ -7,4 +7,12 @@ def test_predict_output():
     neighbors = [Neighbor(app_id="x", similarity=0.9)]
     out = p.predict({"category":"Health & Fitness", "features":["sharing"]}, neighbors)
     assert 0.5 <= out.score <= 0.9
-    assert isinstance(out.segments, list)
\ No newline at end of file
+    assert isinstance(out.segments, list)
+
+
+def test_empty_ctr_window_falls_back_to_lifetime():
+    performance_data = {"x": {"ctr": 0.0008}}  # no impressions in the last 7 days: no ctr_7d key
+    p = PerformancePredictor("v1", performance_data=performance_data)
+    neighbors = [Neighbor(app_id="x", similarity=0.9)]
+    lifetime = p.predict({}, neighbors)
+    assert p.predict({}, neighbors, ctr_window="7d").score == lifetime.score == 0.8
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from app.instrumentation.profiler import SamplingProfiler, run_profile
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_profiler_returns_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy worker")
+    worker.start()
+    try:
+        profiler = SamplingProfiler(0.2, hz=200)
+        output = profiler.run()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 10
+    lines = output.strip().splitlines()
+    assert any(line.startswith("busy_worker;") and "test_profiler:_busy_loop" in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+
+def test_only_one_profile_at_a_time():
+    results = []
+    t = threading.Thread(target=lambda: results.append(run_profile(0.3, hz=10)))
+    t.start()
+    time.sleep(0.05)
+    assert run_profile(0.1, hz=10) is None
+    t.join()
+    assert results[0] is not None
@@ -0,0 +1,32 @@
+import json
+
+from app.models.neighbors import NeighborBatch
+from app.utils import responses
+from app.utils.responses import FastJSONResponse, encode_similar
+
+
+def _batch():
+    return NeighborBatch(
+        ids=["app_1", "app_2"],
+        sims=[0.91, 0.5],
+        names=["Run \"Fast\"", None],
+        categories=["Health & Fitness", None],
+    )
+
+
+def test_encode_similar_matches_model_output(monkeypatch):
+    batch = _batch()
+    expected = {"neighbors": [n.model_dump() for n in batch.to_neighbors()], "ab_arm": "v2", "degraded": False}
+    assert json.loads(encode_similar(batch, "v2")) == expected
+
+    # stdlib fallback when orjson is not installed
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(encode_similar(batch, "v2")) == expected
+    assert json.loads(encode_similar(NeighborBatch(), "v1")) == {"neighbors": [], "ab_arm": "v1", "degraded": False}
+
+
+def test_fast_json_response_body():
+    r = FastJSONResponse(body=b'{"a":1}')
+    assert r.body == b'{"a":1}'
+    assert r.media_type == "application/json"
+    assert json.loads(FastJSONResponse({"a": [1, None]}).body) == {"a": [1, None]}
@@ -0,0 +1,161 @@
+import json
+import os
+import shutil
+import signal
+import time
+import urllib.request
+
+import pytest
+
+from app.server import CRASH_LOOP_WINDOW_S, Master, bind_socket
+
+
+class FakeProcesses:
+    """Stand-in for os.fork / os.kill / os.waitpid: children never actually run"""
+
+    def __init__(self):
+        self.next_pid = 1000
+        self.signals = []  # (pid, sig)
+        self.exited = []  # (pid, wait status) waiting to be reaped
+        self.alive = set()
+
+    def fork(self):
+        self.next_pid += 1
+        self.alive.add(self.next_pid)
+        return self.next_pid
+
+    def kill(self, pid, sig):
+        if pid not in self.alive:
+            raise ProcessLookupError(pid)
+        self.signals.append((pid, sig))
+
+    def exit(self, pid, code=0):
+        self.alive.discard(pid)
+        self.exited.append((pid, code << 8))
+
+    def waitpid(self, pid, options):
+        if self.exited:
+            return self.exited.pop(0)
+        if not self.alive:
+            raise ChildProcessError()
+        return 0, 0
+
+
+@pytest.fixture
+def procs(monkeypatch):
+    fake = FakeProcesses()
+    monkeypatch.setattr(os, "fork", fake.fork)
+    monkeypatch.setattr(os, "kill", fake.kill)
+    monkeypatch.setattr(os, "waitpid", fake.waitpid)
+    return fake
+
+
+@pytest.fixture
+def master(procs):
+    m = Master(app=None, sock=None, workers=2, worker_timeout_s=5.0,
+               heartbeat_interval_s=1.0, graceful_timeout_s=1.0)
+    yield m
+    shutil.rmtree(m._heartbeat_dir, ignore_errors=True)
+
+
+def test_maintain_starts_missing_workers(master, procs):
+    master._maintain()
+    assert sorted(master.workers) == [1001, 1002]
+    master._maintain()
+    assert len(master.workers) == 2  # already at strength
+
+
+def test_reap_replaces_crashed_worker_after_backoff(master, procs):
+    master._maintain()
+    heartbeat = master.workers[1001].heartbeat_path
+
+    procs.exit(1001, code=1)  # dies right after starting: crash loop
+    master._reap()
+    assert 1001 not in master.workers
+    assert not os.path.exists(heartbeat)
+    assert master._next_spawn > time.monotonic()
+
+    master._maintain()
+    assert len(master.workers) == 1  # replacement held back by the backoff
+
+    master._next_spawn = 0.0
+    master._maintain()
+    assert sorted(master.workers) == [1002, 1003]
+
+
+def test_reap_without_backoff_for_long_lived_worker(master, procs):
+    master._maintain()
+    master.workers[1001].started_at -= CRASH_LOOP_WINDOW_S + 1
+    procs.exit(1001, code=1)
+    master._reap()
+    master._maintain()
+    assert sorted(master.workers) == [1002, 1003]
+
+
+def test_reap_clears_workers_when_no_children_remain(master, procs):
+    master._maintain()
+    procs.alive.clear()
+    master._reap()
+    assert master.workers == {}
+
+
+def test_check_heartbeats_kills_stale_workers(master, procs):
+    master._maintain()
+    stale = master.workers[1001].heartbeat_path
+    old = time.time() - 60
+    os.utime(stale, (old, old))
+    os.utime(master.workers[1002].heartbeat_path, None)
+
+    master._check_heartbeats()
+    assert procs.signals == [(1001, signal.SIGKILL)]
+
+    # Workers draining after a graceful restart are left alone
+    procs.signals.clear()
+    master._retiring.add(1001)
+    master._check_heartbeats()
+    assert procs.signals == []
+
+
+def test_restart_workers_replaces_then_retires(master, procs):
+    master._maintain()
+    master.restart_workers()
+
+    assert sorted(master.workers) == [1001, 1002, 1003, 1004]
+    assert master._retiring == {1001, 1002}
+    assert sorted(procs.signals) == [(1001, signal.SIGTERM), (1002, signal.SIGTERM)]
+    master._maintain()
+    assert len(master.workers) == 4  # retiring workers don't count towards the target
+
+    # Old workers exiting is expected: no replacement, no crash-loop backoff
+    procs.exit(1001)
+    procs.exit(1002)
+    master._reap()
+    assert sorted(master.workers) == [1003, 1004]
+    assert master._retiring == set()
+    assert master._next_spawn == 0.0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_serves_preloaded_app(monkeypatch):
+    from app.main import app, readiness
+
+    # As after app.server.preload(): the worker must not load data itself
+    monkeypatch.setattr(readiness, "ready", True)
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    master = Master(app, sock, workers=1, worker_timeout_s=30.0,
+                    heartbeat_interval_s=0.2, graceful_timeout_s=5.0)
+    master._maintain()
+    try:
+        body = None
+        for _ in range(100):
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as r:
+                    body = json.loads(r.read())
+                break
+            except OSError:
+                time.sleep(0.1)
+        assert body is not None and body["status"] == "ok"
+    finally:
+        master.shutdown()
+    assert master.workers == {}
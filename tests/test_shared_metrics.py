@@ -0,0 +1,29 @@
+from app.instrumentation.metrics import MetricsCollector
+from app.instrumentation.shared_metrics import SharedMetricsWriter, read_fleet_summary
+
+
+def test_fleet_summary_sums_worker_files(tmp_path):
+    writers = []
+    for worker, (arm, latency, n) in enumerate([("v1", 10.0, 100), ("v2", 50.0, 50)]):
+        collector = MetricsCollector()
+        for _ in range(n):
+            collector.record_request("/api/v1/find-similar", 200, latency)
+            collector.record_ab_assignment("/api/v1/find-similar", arm)
+        collector.record_request("/api/v1/predict", 500, 1.0)
+        writer = SharedMetricsWriter(str(tmp_path), collector, worker_id=f"w{worker}")
+        writer.flush()
+        writers.append(writer)
+
+    fleet = read_fleet_summary(str(tmp_path))
+    assert fleet["workers"] == 2
+    assert fleet["requests"]["total"] == 152
+    assert fleet["requests"]["by_status_class"] == {"2xx": 150, "5xx": 2}
+    assert fleet["ab_tests"]["by_arm"] == {"v1": 100, "v2": 50}
+    latency = fleet["latencies"]["/api/v1/find-similar"]
+    assert latency["count"] == 150
+    assert abs(latency["p99_ms"] - 50.0) < 1.0
+    assert abs(latency["p50_ms"] - 10.0) < 0.2
+
+    for writer in writers:
+        writer.stop()
+    assert read_fleet_summary(str(tmp_path))["workers"] == 0
@@ -14,4 +14,23 @@ def test_topk_neighbors_smoke(tmp_path, monkeypatch):
     sim = SimilarityService(store)
     q = [0.5]*64
     res = sim.topk_neighbors(q, 10, {"category":["Games"]}, "v1")
-    assert len(res) == 10
\ No newline at end of file
+    assert len(res) == 10
+
+def test_search_stops_at_deadline(monkeypatch):
+    from time import perf_counter
+    from app.services.similarity import DEADLINE_CHECK_ROWS
+
+    store = EmbeddingsStore("data/mock_embeddings_v1.pkl", "data/mock_embeddings_v2.pkl")
+    fake_index = {f"app_{i}": {"vec": [i*0.01]*64} for i in range(1000)}
+    monkeypatch.setattr(store, "get_by_arm", lambda arm: fake_index)
+    sim = SimilarityService(store)
+    q = [0.5]*64
+
+    full = sim.search(q, 10, None, "v1", deadline=perf_counter() + 60)
+    assert len(full) == 10 and not full.degraded
+
+    # An expired deadline still scores the first chunk: partial, never empty
+    expired = sim.search(q, 10, None, "v1", deadline=perf_counter() - 1)
+    assert expired.degraded
+    assert len(expired) == 10
+    assert set(expired.ids) <= {f"app_{i}" for i in range(DEADLINE_CHECK_ROWS)}
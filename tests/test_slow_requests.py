@@ -0,0 +1,32 @@
+from app.instrumentation.slow_requests import SlowRequestBuffer, filter_shape, payload_fingerprint
+
+
+def test_keeps_slowest_n_and_builds_entries_lazily():
+    buffer = SlowRequestBuffer(per_endpoint=3, window_s=60)
+    built = []
+
+    def build(i):
+        def _build():
+            built.append(i)
+            return {"correlation_id": f"cid-{i}"}
+        return _build
+
+    for i, latency in enumerate([5, 50, 10, 40, 1, 30, 2]):
+        buffer.offer("/api/v1/find-similar", latency, build(i))
+
+    entries = buffer.snapshot()["/api/v1/find-similar"]
+    assert [e["latency_ms"] for e in entries] == [50, 40, 30]
+    assert [e["correlation_id"] for e in entries] == ["cid-1", "cid-3", "cid-5"]
+    assert 4 not in built and 6 not in built  # fast requests never build an entry
+
+
+def test_expired_entries_make_room():
+    buffer = SlowRequestBuffer(per_endpoint=1, window_s=0.0)
+    buffer.offer("/x", 100, lambda: {})
+    assert buffer.offer("/x", 1, lambda: {"correlation_id": "new"})
+
+
+def test_fingerprint_and_filter_shape():
+    assert payload_fingerprint(b"abc") == payload_fingerprint("abc")
+    assert len(payload_fingerprint("abc")) == 16
+    assert filter_shape({"category": ["Games", "Sports"], "region": ["US"]}) == {"category": 2, "region": 1}
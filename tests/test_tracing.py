@@ -0,0 +1,25 @@
+import contextvars
+
+from app.instrumentation.tracing import get_trace, start_trace, trace_stage
+
+
+def _traced_request():
+    with trace_stage("untraced"):
+        pass
+    assert get_trace() is None
+
+    trace = start_trace()
+    with trace_stage("pick_arm"):
+        pass
+    with trace_stage("scoring"):
+        sum(range(1000))
+    return trace
+
+
+def test_stages_are_recorded_only_inside_a_trace():
+    trace = contextvars.copy_context().run(_traced_request)
+
+    assert [name for name, _ in trace.stages] == ["pick_arm", "scoring"]
+    assert all(ms >= 0 for _, ms in trace.stages)
+    assert trace.server_timing().startswith("pick_arm;dur=")
+    assert get_trace() is None
@@ -0,0 +1,24 @@
+import pytest
+
+from app.services.warmup import Readiness, load_concurrently
+
+
+def test_load_concurrently_times_each_loader():
+    readiness = Readiness()
+    results = load_concurrently({"a": lambda: 1, "b": lambda: {"x": 2}}, readiness)
+    assert results == {"a": 1, "b": {"x": 2}}
+    assert set(readiness.as_dict()["load_timings_ms"]) == {"a", "b"}
+    assert readiness.as_dict()["ready"] is False
+
+
+def test_load_concurrently_raises_after_all_finish():
+    readiness = Readiness()
+    finished = []
+
+    def fail():
+        raise FileNotFoundError("missing.pkl")
+
+    with pytest.raises(FileNotFoundError):
+        load_concurrently({"bad": fail, "good": lambda: finished.append(True)}, readiness)
+    assert finished == [True]
+    assert set(readiness.load_timings_ms) == {"bad", "good"}